@@ -0,0 +1,116 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Compute times kept per function for the percentiles. Older samples are dropped once a function has this many.
+max_samples = int(os.environ.get("CACHE_STATS_SAMPLES", 1000))
+
+# One record per instrumented function, keyed by module and qualified name. Updated from every session's thread.
+stats = {}
+stats_lock = threading.Lock()
+
+
+def get_result_bytes(result):
+    """Returns the approximate in-memory size of a cached result, counting the contents of frames and containers."""
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        usage = result.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(result, pd.DataFrame) else usage)
+    if isinstance(result, dict):
+        return sys.getsizeof(result) + sum(get_result_bytes(value) for value in result.values())
+    if isinstance(result, (list, tuple)):
+        return sys.getsizeof(result) + sum(get_result_bytes(value) for value in result)
+    return sys.getsizeof(result)
+
+
+def instrument(cache_decorator):
+    """Applies a Streamlit cache decorator and records calls, misses, compute time and result size.
+
+    Use in place of the cache decorator, e.g. `@cache_stats.instrument(st.cache_data(show_spinner=False))`.
+    A miss is any call the in-memory cache did not answer, including ones result_cache.persist served from disk.
+
+    Args:
+        cache_decorator: st.cache_data or st.cache_resource, bare or called with its options.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        # Page scripts define their cached functions again on every rerun, so an existing record is kept.
+        with stats_lock:
+            record = stats.setdefault(
+                name, {"calls": 0, "misses": 0, "compute_seconds": deque(maxlen=max_samples), "result_bytes": None}
+            )
+
+        # Only runs when the cache has no entry, so everything recorded here is a miss.
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            result_bytes = get_result_bytes(result)
+            with stats_lock:
+                record["misses"] += 1
+                record["compute_seconds"].append(seconds)
+                record["result_bytes"] = result_bytes
+            return result
+
+        cached = cache_decorator(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stats_lock:
+                record["calls"] += 1
+            return cached(*args, **kwargs)
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+def get_stats():
+    """Returns one row per instrumented function with its calls, hit ratio, compute percentiles and result size."""
+    with stats_lock:
+        records = [(name, dict(record, compute_seconds=list(record["compute_seconds"]))) for name, record in stats.items()]
+    rows = []
+    for name, record in records:
+        seconds = np.array(record["compute_seconds"])
+        # A call still computing counts as a miss once it finishes, so hits never go negative.
+        hits = max(record["calls"] - record["misses"], 0)
+        p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000 if len(seconds) else (None, None, None)
+        rows.append({
+            "FUNCTION": name,
+            "CALLS": record["calls"],
+            "HITS": hits,
+            "MISSES": record["misses"],
+            "HIT_RATIO": hits / record["calls"] if record["calls"] else None,
+            "P50_MS": p50,
+            "P95_MS": p95,
+            "P99_MS": p99,
+            "MAX_MS": seconds.max() * 1000 if len(seconds) else None,
+            "TOTAL_COMPUTE_S": seconds.sum(),
+            "RESULT_BYTES": record["result_bytes"],
+        })
+    return pd.DataFrame(rows, columns=[
+        "FUNCTION", "CALLS", "HITS", "MISSES", "HIT_RATIO", "P50_MS", "P95_MS", "P99_MS", "MAX_MS",
+        "TOTAL_COMPUTE_S", "RESULT_BYTES",
+    ])
+
+
+def to_jsonl():
+    """Returns the current stats as JSON lines, one per function, stamped with the time and process id."""
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    lines = []
+    for row in get_stats().to_dict("records"):
+        row = {key.lower(): None if pd.isna(value) else value for key, value in row.items()}
+        lines.append(json.dumps({"timestamp": timestamp, "pid": os.getpid(), **row}, default=float))
+    return "".join(line + "\n" for line in lines)
+
+
+def write_jsonl(path):
+    """Appends the current stats to a JSON lines file for offline analysis."""
+    with open(path, "a") as output:
+        output.write(to_jsonl())
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from shared.utils import cache_stats, query_log
+
+refresh_options = [1, 2, 5, 10, 30]
+recent_query_count = 200
+
+
+def show_cache_stats():
+    """Draws the per-function cache statistics and their JSONL download."""
+    st.subheader("Cached Functions")
+    st.markdown(
+        "Calls, hit ratio, compute time and result size of every cached data function in this server process, "
+        "across all sessions. A miss is a call the in-memory cache did not answer."
+    )
+    stats = cache_stats.get_stats()
+    st.dataframe(
+        stats.sort_values("TOTAL_COMPUTE_S", ascending=False),
+        hide_index=True,
+        column_config={
+            "HIT_RATIO": st.column_config.NumberColumn("HIT_RATIO", format="percent"),
+            "P50_MS": st.column_config.NumberColumn("P50_MS", format="%.1f"),
+            "P95_MS": st.column_config.NumberColumn("P95_MS", format="%.1f"),
+            "P99_MS": st.column_config.NumberColumn("P99_MS", format="%.1f"),
+            "MAX_MS": st.column_config.NumberColumn("MAX_MS", format="%.1f"),
+            "TOTAL_COMPUTE_S": st.column_config.NumberColumn("TOTAL_COMPUTE_S", format="%.3f"),
+            "RESULT_BYTES": st.column_config.NumberColumn("RESULT_BYTES", format="%d"),
+        },
+    )
+    st.download_button(
+        "Download JSONL",
+        cache_stats.to_jsonl(),
+        file_name="cache_stats.jsonl",
+        mime="application/jsonl",
+        on_click="ignore",
+        key="cache-stats-download",
+    )
+
+
+def show_query_log():
+    """Draws the per-page rollup and the most recent Snowflake queries, and the query log download."""
+    st.subheader("Snowflake Queries")
+    st.markdown(
+        "Queries sent through `query_log.TracedConnection` in this server process, rolled up by the page that "
+        "issued them. Each query's `QUERY_TAG` holds its app, page, function and trace id."
+    )
+    st.dataframe(
+        query_log.get_page_rollup(),
+        hide_index=True,
+        column_config={
+            "TOTAL_SECONDS": st.column_config.NumberColumn("TOTAL_SECONDS", format="%.3f"),
+            "MAX_SECONDS": st.column_config.NumberColumn("MAX_SECONDS", format="%.3f"),
+        },
+    )
+    st.dataframe(query_log.get_entries().tail(recent_query_count).iloc[::-1], hide_index=True)
+    st.download_button(
+        "Download JSONL",
+        query_log.to_jsonl(),
+        file_name="query_log.jsonl",
+        mime="application/jsonl",
+        on_click="ignore",
+        key="query-log-download",
+    )
+
+
+def show_warehouse_cost(conn):
+    """Draws bytes scanned and credits per page from QUERY_HISTORY, loaded on request."""
+    st.subheader("Warehouse Cost")
+    app = Path(get_script_run_ctx().main_script_path).parent.name
+    days = st.number_input("Days", min_value=1, max_value=365, value=7)
+    # The account usage views are slow to query and lag by hours, so they are only read on request.
+    if st.button("Load From QUERY_HISTORY"):
+        st.dataframe(query_log.get_warehouse_cost(conn, app, days), hide_index=True)
+
+
+def render_diagnostics(conn=None):
+    """Draws the diagnostics page, refreshing the live tables on a timer.
+
+    Args:
+        conn: Optional Snowflake connection. When given, warehouse cost per page can be loaded from QUERY_HISTORY.
+    """
+    st.header("Diagnostics", divider="grey")
+    refresh_seconds = st.sidebar.select_slider("Refresh Every (Seconds)", options=refresh_options, value=2)
+
+    @st.fragment(run_every=refresh_seconds)
+    def show_live_stats():
+        show_cache_stats()
+        show_query_log()
+
+    show_live_stats()
+    if conn is not None:
+        show_warehouse_cost(conn)
@@ -1,51 +1,322 @@
+import functools
+import os
+
+import pandas as pd
+import pyarrow as pa
 import streamlit as st
+from streamlit.logger import get_logger
+
+from shared.utils import cache_stats, result_cache
+
+logger = get_logger(__name__)
+
+medical_claim_columns = [
+    "MEDICAL_CLAIM_ID",
+    "CLAIM_ID",
+    "CLAIM_LINE_NUMBER",
+    "ENCOUNTER_ID",
+    "ENCOUNTER_TYPE",
+    "ENCOUNTER_GROUP",
+    "CLAIM_TYPE",
+    "PERSON_ID",
+    "MEMBER_ID",
+    "PAYER",
+    "PLAN",
+    "CLAIM_START_DATE",
+    "CLAIM_END_DATE",
+    "CLAIM_LINE_START_DATE",
+    "CLAIM_LINE_END_DATE",
+    "SERVICE_CATEGORY_1",
+    "SERVICE_CATEGORY_2",
+    "SERVICE_CATEGORY_3",
+    "PLACE_OF_SERVICE_CODE",
+    "PLACE_OF_SERVICE_DESCRIPTION",
+    "SERVICE_UNIT_QUANTITY",
+    "HCPCS_CODE",
+    "HCPCS_MODIFIER_1",
+    "HCPCS_MODIFIER_2",
+    "HCPCS_MODIFIER_3",
+    "HCPCS_MODIFIER_4",
+    "HCPCS_MODIFIER_5",
+    "RENDERING_ID",
+    "RENDERING_NAME",
+    "BILLING_ID",
+    "BILLING_TIN",
+    "PAID_DATE",
+    "PAID_AMOUNT",
+    "ALLOWED_AMOUNT",
+    "CHARGE_AMOUNT",
+    "COINSURANCE_AMOUNT",
+    "COPAYMENT_AMOUNT",
+    "DEDUCTIBLE_AMOUNT",
+    "TOTAL_COST_AMOUNT",
+    "IN_NETWORK_FLAG",
+    "ENROLLMENT_FLAG",
+    "DATA_SOURCE",
+]
+
+claims_table = "DEV_PAUL.TEST.TEST_TABLE"
+
+# Maximum number of claim rows fetched per query. Set TUVA_ROW_BUDGET=0 to fetch every row.
+default_row_budget = int(os.environ.get("TUVA_ROW_BUDGET", 1000))
+
+# The claim query results below are keyed by the claims table's LAST_ALTERED time, so a table change is picked
+# up by both the in-memory and on-disk caches. The time is probed at most once a minute.
+version_probe_seconds = 60
+
+
+def check_columns(columns):
+    """Returns columns as a list, raising ValueError if any is not a medical claim column."""
+    columns = list(columns)
+    unknown = [column for column in columns if column not in medical_claim_columns]
+    if unknown:
+        raise ValueError(f"Unknown medical claim columns: {', '.join(unknown)}")
+    return columns
+
+
+def fetch_arrow_frame(_conn, sql, params=None):
+    """Runs a query and builds a DataFrame from its Arrow record batches.
+
+    It draws nothing itself: it runs inside st.cache_data, which would replay any element on every cache hit.
+    The cached callers show a spinner while it runs instead.
+    """
+    cursor = _conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        batches = list(cursor.fetch_arrow_batches())
+        if not batches:
+            return pd.DataFrame(columns=[column.name for column in cursor.description])
+        return pa.concat_tables(batches).to_pandas()
+    finally:
+        cursor.close()
+
+
+# DATA VERSION
+
+
+@cache_stats.instrument(st.cache_data(ttl=version_probe_seconds, show_spinner=False))
+def get_claims_table_version(_conn, connection_key):
+    """Returns the claims table's LAST_ALTERED time on a connection, or None if it cannot be read."""
+    database, schema, table = claims_table.split(".")
+    try:
+        versions = _conn.query(f"""
+            SELECT LAST_ALTERED
+            FROM {database}.INFORMATION_SCHEMA.TABLES
+            WHERE TABLE_SCHEMA = ? AND TABLE_NAME = ?
+        """, params=[schema, table], ttl=0)
+    except Exception as e:
+        # Without a version every entry keeps its current key, until it expires.
+        logger.warning(f"Could not read the claims table version: {e}")
+        return None
+    return str(versions["LAST_ALTERED"].iloc[0]) if len(versions) else None
+
+
+def versioned(func):
+    """Passes the claims table's current version to a cached function as its data_version argument."""
+    @functools.wraps(func)
+    def wrapper(_conn, *args, **kwargs):
+        # Connections are shared resources that live as long as the process, so their id tells them apart.
+        version = get_claims_table_version(_conn, f"{type(_conn).__name__}-{id(_conn)}")
+        return func(_conn, *args, data_version=version, **kwargs)
+    wrapper.clear = func.clear
+    return wrapper
+
+
+# FILTERS
+# UI filters are pushed into the claims query as bound predicates. Pages pass them through normalize_filters
+# first, so the same selection made in a different order reuses the same cache entries.
+
+# Columns filtered by an inclusive (low, high) range; every other column is filtered by a set of values.
+range_filter_columns = ("CLAIM_START_DATE", "PAID_AMOUNT")
+
+
+def normalize_filters(filters=None):
+    """Turns a {column: values} dict into a sorted tuple of (column, values) pairs, dropping empty filters.
 
+    Range columns take a (low, high) pair where either end may be None; dates are stored as ISO strings.
+    Other columns take an iterable of values to match.
+    """
+    normalized = []
+    for column, values in (filters or {}).items():
+        check_columns([column])
+        if column in range_filter_columns:
+            bounds = tuple(
+                None if bound is None else bound.isoformat() if hasattr(bound, "isoformat") else float(bound)
+                for bound in values
+            )
+            if bounds != (None, None):
+                normalized.append((column, bounds))
+        elif values:
+            normalized.append((column, tuple(sorted({str(value) for value in values}))))
+    return tuple(sorted(normalized))
 
-@st.cache_data
-def get_table_data(_conn):
-    return _conn.query("""
+
+def build_filter_clause(filters):
+    """Returns a WHERE clause and its parameters for normalized filters ("" and [] when there are none)."""
+    predicates = []
+    params = []
+    for column, values in filters:
+        if column in range_filter_columns:
+            low, high = values
+            if low is not None:
+                predicates.append(f"{column} >= ?")
+                params.append(low)
+            if high is not None:
+                predicates.append(f"{column} <= ?")
+                params.append(high)
+        else:
+            predicates.append(f"{column} IN ({', '.join('?' * len(values))})")
+            params.extend(values)
+    if not predicates:
+        return "", []
+    return "WHERE " + " AND ".join(predicates), params
+
+
+def get_claims_source(row_budget, filters=()):
+    """Returns the FROM clause and its parameters for the first row_budget claim rows matching filters.
+
+    A row_budget of 0 or None selects every matching row.
+    """
+    where, params = build_filter_clause(filters)
+    if row_budget:
+        return f"(SELECT * FROM {claims_table} {where} LIMIT ?)", params + [int(row_budget)]
+    if where:
+        return f"(SELECT * FROM {claims_table} {where})", params
+    return claims_table, None
+
+
+@versioned
+@cache_stats.instrument(st.cache_data(show_spinner="Running query..."))
+@result_cache.persist()
+def get_table_data(_conn, columns=None, row_budget=default_row_budget, filters=(), data_version=None):
+    """Fetches claims matching normalized filters, limited to the given columns and to row_budget rows."""
+    columns = check_columns(columns or medical_claim_columns)
+    source, params = get_claims_source(row_budget, filters)
+    return fetch_arrow_frame(_conn, f"SELECT {', '.join(columns)} FROM {source}", params)
+
+
+# AGGREGATES
+# The chart queries below aggregate in Snowflake so only the grouped rows are fetched. They group over every
+# claim matching the filters; the row budget only limits the raw rows fetched by get_table_data.
+
+
+@versioned
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist()
+def get_claim_counts(_conn, group_by, count_column=None, filters=(), data_version=None):
+    """Counts claim lines, or non-null count_column values, per combination of the group_by columns."""
+    group_by = check_columns(group_by)
+    counted = check_columns([count_column])[0] if count_column else "*"
+    source, params = get_claims_source(None, filters)
+    keys = ", ".join(group_by)
+    not_null = " AND ".join(f"{column} IS NOT NULL" for column in group_by)
+    return _conn.query(f"""
+        SELECT {keys}, COUNT({counted}) AS CLAIM_COUNT
+        FROM {source}
+        WHERE {not_null}
+        GROUP BY {keys}
+        ORDER BY CLAIM_COUNT DESC, {keys}
+    """, params=params)
+
+
+@versioned
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist()
+def get_paid_by_category(_conn, category, filters=(), data_version=None):
+    """Sums PAID_AMOUNT per value of the category column."""
+    category = check_columns([category])[0]
+    source, params = get_claims_source(None, filters)
+    return _conn.query(f"""
+        SELECT {category}, COALESCE(SUM(PAID_AMOUNT), 0) AS PAID_AMOUNT
+        FROM {source}
+        WHERE {category} IS NOT NULL
+        GROUP BY {category}
+        ORDER BY {category}
+    """, params=params)
+
+
+@versioned
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist()
+def get_monthly_paid_and_allowed(_conn, filters=(), data_version=None):
+    """Sums PAID_AMOUNT and ALLOWED_AMOUNT per claim start month."""
+    source, params = get_claims_source(None, filters)
+    return _conn.query(f"""
         SELECT
-            MEDICAL_CLAIM_ID,
-            CLAIM_ID,
-            CLAIM_LINE_NUMBER,
-            ENCOUNTER_ID,
-            ENCOUNTER_TYPE,
-            ENCOUNTER_GROUP,
-            CLAIM_TYPE,
-            PERSON_ID,
-            MEMBER_ID,
-            PAYER,
-            PLAN,
-            CLAIM_START_DATE,
-            CLAIM_END_DATE,
-            CLAIM_LINE_START_DATE,
-            CLAIM_LINE_END_DATE,
-            SERVICE_CATEGORY_1,
-            SERVICE_CATEGORY_2,
-            SERVICE_CATEGORY_3,
-            PLACE_OF_SERVICE_CODE,
-            PLACE_OF_SERVICE_DESCRIPTION,
-            SERVICE_UNIT_QUANTITY,
-            HCPCS_CODE,
-            HCPCS_MODIFIER_1,
-            HCPCS_MODIFIER_2,
-            HCPCS_MODIFIER_3,
-            HCPCS_MODIFIER_4,
-            HCPCS_MODIFIER_5,
-            RENDERING_ID,
-            RENDERING_NAME,
-            BILLING_ID,
-            BILLING_TIN,
-            PAID_DATE,
-            PAID_AMOUNT,
-            ALLOWED_AMOUNT,
-            CHARGE_AMOUNT,
-            COINSURANCE_AMOUNT,
-            COPAYMENT_AMOUNT,
-            DEDUCTIBLE_AMOUNT,
-            TOTAL_COST_AMOUNT,
-            IN_NETWORK_FLAG,
-            ENROLLMENT_FLAG,
-            DATA_SOURCE
-        FROM DEV_PAUL.TEST.TEST_TABLE LIMIT 1000
-    """)
\ No newline at end of file
+            DATE_TRUNC('MONTH', CLAIM_START_DATE) AS CLAIM_MONTH,
+            COALESCE(SUM(PAID_AMOUNT), 0) AS PAID_AMOUNT,
+            COALESCE(SUM(ALLOWED_AMOUNT), 0) AS ALLOWED_AMOUNT
+        FROM {source}
+        WHERE CLAIM_START_DATE IS NOT NULL
+        GROUP BY CLAIM_MONTH
+        ORDER BY CLAIM_MONTH
+    """, params=params)
+
+
+# FILTER SIDEBAR
+
+# Columns offered as multiselect filters, by label.
+value_filter_columns = {
+    "Payer": "PAYER",
+    "Plan": "PLAN",
+    "Encounter Group": "ENCOUNTER_GROUP",
+    "Encounter Type": "ENCOUNTER_TYPE",
+}
+
+
+@cache_stats.instrument(st.cache_data)
+def get_filter_options(_conn):
+    """Returns the claim start date and paid amount ranges and the distinct values of each value filter column."""
+    ranges = _conn.query(f"""
+        SELECT
+            MIN(CLAIM_START_DATE) AS MIN_DATE,
+            MAX(CLAIM_START_DATE) AS MAX_DATE,
+            MIN(PAID_AMOUNT) AS MIN_PAID,
+            MAX(PAID_AMOUNT) AS MAX_PAID
+        FROM {claims_table}
+    """).iloc[0]
+    values = _conn.query(" UNION ALL ".join(
+        f"SELECT DISTINCT '{column}' AS FILTER_COLUMN, CAST({column} AS VARCHAR) AS FILTER_VALUE "
+        f"FROM {claims_table} WHERE {column} IS NOT NULL"
+        for column in value_filter_columns.values()
+    ) + " ORDER BY FILTER_COLUMN, FILTER_VALUE")
+    dates = (None if pd.isna(ranges[key]) else pd.Timestamp(ranges[key]).date() for key in ("MIN_DATE", "MAX_DATE"))
+    paid = (None if pd.isna(ranges[key]) else float(ranges[key]) for key in ("MIN_PAID", "MAX_PAID"))
+    options = {"CLAIM_START_DATE": tuple(dates), "PAID_AMOUNT": tuple(paid)}
+    for column in value_filter_columns.values():
+        options[column] = values.loc[values["FILTER_COLUMN"] == column, "FILTER_VALUE"].tolist()
+    return options
+
+
+def render_claim_filters(conn):
+    """Draws the claim filters in the sidebar and returns the selection as normalized filters."""
+    options = get_filter_options(conn)
+    filters = {}
+    with st.sidebar:
+        st.subheader("Filters")
+        min_date, max_date = options["CLAIM_START_DATE"]
+        if min_date is not None:
+            dates = st.date_input(
+                "Claim Start Date",
+                value=(min_date, max_date),
+                min_value=min_date,
+                max_value=max_date,
+                key="claim_filter_start_date",
+            )
+            # The range is only applied once both ends are picked and it differs from the full range.
+            if len(dates) == 2 and tuple(dates) != (min_date, max_date):
+                filters["CLAIM_START_DATE"] = dates
+        for label, column in value_filter_columns.items():
+            filters[column] = st.multiselect(label, options[column], key=f"claim_filter_{column.lower()}")
+        min_paid, max_paid = options["PAID_AMOUNT"]
+        if min_paid is not None and min_paid < max_paid:
+            paid = st.slider(
+                "Paid Amount",
+                min_value=min_paid,
+                max_value=max_paid,
+                value=(min_paid, max_paid),
+                key="claim_filter_paid_amount",
+            )
+            if paid != (min_paid, max_paid):
+                filters["PAID_AMOUNT"] = paid
+    return normalize_filters(filters)
@@ -0,0 +1,253 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from shared.utils.cache_stats import get_result_bytes
+
+logger = get_logger(__name__)
+
+# The most recent queries are kept in memory for the diagnostics page. Older ones are dropped.
+max_entries = int(os.environ.get("QUERY_LOG_SIZE", 5000))
+# When set, every query is also appended to this JSON lines file for offline analysis.
+log_path = os.environ.get("QUERY_LOG_PATH")
+
+# Helpers that only pass a query through to the connection. The calling function is the first frame above them.
+passthrough_functions = {"run_query", "fetch_arrow_frame"}
+
+# A query that fails because the connection was dropped is retried after resetting the connection.
+# 08001 is the SQLSTATE Snowflake reports when a connection was not established.
+connection_not_established_sqlstate = "08001"
+query_attempts = 3
+retry_wait_seconds = 1
+
+entries = deque(maxlen=max_entries)
+entries_lock = threading.Lock()
+
+
+def get_page():
+    """Returns the title of the page whose script issued the query, or "(background)" outside a script run."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return "(background)"
+    pages = ctx.pages_manager
+    page = pages.get_pages().get(pages.current_page_script_hash)
+    return page["page_name"] if page and page.get("page_name") else Path(ctx.main_script_path).stem
+
+
+def get_app():
+    """Returns the folder name of the running app, which groups its queries in QUERY_HISTORY."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return Path(ctx.main_script_path).parent.name if ctx else Path(sys.argv[0]).resolve().parent.name
+
+
+def get_caller():
+    """Returns module.function of the data function that issued the query, skipping wrappers and passthroughs."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        internal = module == __name__ or module.startswith("streamlit.")
+        if not internal and frame.f_code.co_name not in passthrough_functions:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def start_trace():
+    """Returns a trace record for a new query, and the QUERY_TAG that lets QUERY_HISTORY rows be joined to it."""
+    trace = {
+        "trace_id": uuid.uuid4().hex,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "app": get_app(),
+        "page": get_page(),
+        "function": get_caller(),
+    }
+    tag = json.dumps({key: trace[key] for key in ("app", "page", "function", "trace_id")})
+    return trace, tag
+
+
+def finish_trace(trace, started, query_id, rows, result_bytes, error=None):
+    """Completes a trace record and adds it to the log."""
+    trace.update(
+        query_id=query_id,
+        seconds=round(time.perf_counter() - started, 6),
+        rows=rows,
+        result_bytes=result_bytes,
+        error=error,
+    )
+    with entries_lock:
+        entries.append(trace)
+        if log_path:
+            try:
+                with open(log_path, "a") as output:
+                    output.write(json.dumps(trace) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not write query log {log_path}: {e}")
+
+
+class TracedCursor:
+    """Cursor proxy that tags each statement and logs it when the cursor is closed."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.trace = None
+
+    def __getattr__(self, name):
+        """Passes other attributes, like rowcount and description, through to the cursor."""
+        return getattr(self.cursor, name)
+
+    def execute(self, sql, params=None, **kwargs):
+        """Runs a statement with the trace's QUERY_TAG, finishing the trace of any earlier statement first."""
+        self.finish()
+        self.trace, tag = start_trace()
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.result_bytes = 0
+        statement_params = {**(kwargs.pop("_statement_params", None) or {}), "QUERY_TAG": tag}
+        try:
+            self.cursor.execute(sql, params, _statement_params=statement_params, **kwargs)
+        except Exception as e:
+            self.finish(error=repr(e))
+            raise
+        return self
+
+    def fetch_arrow_batches(self):
+        """Yields the result's Arrow batches, counting their rows and bytes."""
+        for batch in self.cursor.fetch_arrow_batches():
+            self.rows += batch.num_rows
+            self.result_bytes += batch.nbytes
+            yield batch
+
+    def fetch_pandas_all(self):
+        """Fetches the whole result as a DataFrame, counting its rows and bytes."""
+        result = self.cursor.fetch_pandas_all()
+        self.rows += len(result)
+        self.result_bytes += get_result_bytes(result)
+        return result
+
+    def finish(self, error=None):
+        """Logs the current statement, if it has not been logged yet."""
+        if self.trace is not None:
+            finish_trace(
+                self.trace, self.started, getattr(self.cursor, "sfqid", None), self.rows, self.result_bytes, error
+            )
+            self.trace = None
+
+    def close(self):
+        """Logs the last statement and closes the cursor."""
+        self.finish()
+        return self.cursor.close()
+
+
+class TracedConnection:
+    """Wraps a Snowflake connection so every query is tagged and logged with its page, caller and timing.
+
+    Pass it wherever a data function takes a connection.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __getattr__(self, name):
+        """Passes other attributes through to the connection."""
+        return getattr(self.conn, name)
+
+    def cursor(self):
+        """Returns a traced cursor on the connection."""
+        return TracedCursor(self.conn.cursor())
+
+    def query(self, sql, params=None, ttl=None, **kwargs):
+        """Runs a query through a traced cursor and returns its result as a DataFrame.
+
+        Unlike SnowflakeConnection.query, results are not cached by the connection, so each call reaches
+        Snowflake and gets its own query ID. The data functions cache their results with st.cache_data.
+        """
+        # Retry a dropped connection after resetting it, as SnowflakeConnection.query does.
+        for attempt in range(1, query_attempts + 1):
+            cursor = self.cursor()
+            try:
+                cursor.execute(sql, params, **kwargs)
+                return cursor.fetch_pandas_all()
+            except Exception as e:
+                if getattr(e, "sqlstate", None) != connection_not_established_sqlstate or attempt == query_attempts:
+                    raise
+                logger.warning(f"Connection lost, retrying query (attempt {attempt} of {query_attempts}): {e}")
+            finally:
+                cursor.close()
+            time.sleep(retry_wait_seconds)
+            reset = getattr(self.conn, "reset", None)
+            if reset is not None:
+                reset()
+
+
+@st.cache_resource(show_spinner=False)
+def get_traced_connection(name="snowflake"):
+    """Returns the named st.connection wrapped in a TracedConnection, shared by every session."""
+    return TracedConnection(st.connection(name))
+
+
+def get_entries():
+    """Returns the logged queries, oldest first, one row per query."""
+    with entries_lock:
+        rows = list(entries)
+    return pd.DataFrame(rows, columns=[
+        "timestamp", "trace_id", "query_id", "app", "page", "function", "seconds", "rows", "result_bytes", "error",
+    ])
+
+
+def get_page_rollup():
+    """Returns the number of queries, total and slowest time, rows and bytes returned per page, busiest first."""
+    log = get_entries()
+    rollup = log.groupby("page").agg(
+        QUERIES=("trace_id", "count"),
+        TOTAL_SECONDS=("seconds", "sum"),
+        MAX_SECONDS=("seconds", "max"),
+        ROWS=("rows", "sum"),
+        RESULT_BYTES=("result_bytes", "sum"),
+        ERRORS=("error", "count"),
+    )
+    return rollup.reset_index().rename(columns={"page": "PAGE"}).sort_values("TOTAL_SECONDS", ascending=False)
+
+
+def to_jsonl():
+    """Returns the logged queries as JSON lines."""
+    with entries_lock:
+        rows = list(entries)
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+# Bytes scanned and credits are not known to the client. They are joined from Snowflake's account usage views
+# by the query tags above. Those views lag behind by up to a few hours.
+warehouse_cost_sql = """
+    SELECT
+        TRY_PARSE_JSON(h.QUERY_TAG):page::STRING AS PAGE
+        , COUNT(*) AS QUERIES
+        , SUM(h.TOTAL_ELAPSED_TIME) / 1000 AS ELAPSED_SECONDS
+        , SUM(h.BYTES_SCANNED) AS BYTES_SCANNED
+        , SUM(COALESCE(a.CREDITS_ATTRIBUTED_COMPUTE, 0)) AS COMPUTE_CREDITS
+        , SUM(h.CREDITS_USED_CLOUD_SERVICES) AS CLOUD_SERVICES_CREDITS
+    FROM SNOWFLAKE.ACCOUNT_USAGE.QUERY_HISTORY h
+    LEFT JOIN SNOWFLAKE.ACCOUNT_USAGE.QUERY_ATTRIBUTION_HISTORY a ON a.QUERY_ID = h.QUERY_ID
+    WHERE h.START_TIME >= DATEADD('DAY', -?, CURRENT_TIMESTAMP())
+        AND TRY_PARSE_JSON(h.QUERY_TAG):app::STRING = ?
+    GROUP BY PAGE
+    ORDER BY COMPUTE_CREDITS + CLOUD_SERVICES_CREDITS DESC
+"""
+
+
+def get_warehouse_cost(conn, app, days=7):
+    """Returns bytes scanned and credits per page of an app over the last days, from Snowflake's QUERY_HISTORY.
+
+    The role needs access to the SNOWFLAKE.ACCOUNT_USAGE schema.
+    """
+    conn = conn.conn if isinstance(conn, TracedConnection) else conn
+    return conn.query(warehouse_cost_sql, params=[days, app], ttl=15 * 60)
@@ -0,0 +1,109 @@
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+from streamlit.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Query and aggregation results are written here as Parquet files, one per function call, so a restarted
+# server can serve them without recomputing. The directory is relative to the app folder streamlit runs in.
+cache_dir = Path(os.environ.get("RESULT_CACHE_DIR", ".cache/results"))
+# Entries older than this many seconds are recomputed. 0 keeps entries until they are evicted.
+default_ttl = int(os.environ.get("RESULT_CACHE_TTL", 24 * 60 * 60))
+# Once the directory grows past this size, the least recently read entries are deleted.
+max_cache_bytes = int(os.environ.get("RESULT_CACHE_MAX_MB", 512)) * 1024 * 1024
+enabled = os.environ.get("RESULT_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def get_entry_path(func, args, kwargs, version):
+    """Returns the cache file for a call, keyed by the function, its arguments and the data version.
+
+    Like st.cache_data, arguments whose names start with an underscore are left out of the key.
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    key_args = {name: value for name, value in bound.arguments.items() if not name.startswith("_")}
+    key = repr((func.__module__, func.__qualname__, sorted(key_args.items()), version))
+    return cache_dir / f"{func.__qualname__}-{hashlib.sha256(key.encode()).hexdigest()[:24]}.parquet"
+
+
+def read_entry(path, ttl):
+    """Returns the cached frame at path, or None if there is no entry or it has expired."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    # The modified time is when the entry was written; the access time is bumped on every read for eviction.
+    if ttl and time.time() - stat.st_mtime > ttl:
+        path.unlink(missing_ok=True)
+        return None
+    try:
+        result = pd.read_parquet(path)
+    except Exception as e:
+        logger.warning(f"Discarding unreadable result cache entry {path.name}: {e}")
+        path.unlink(missing_ok=True)
+        return None
+    os.utime(path, (time.time(), stat.st_mtime))
+    return result
+
+
+def write_entry(path, result):
+    """Writes a frame to path atomically, then evicts the least recently read entries over the size limit."""
+    # The temp name is unique to the process and thread, so sessions writing the same entry never share it.
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        result.to_parquet(tmp)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.warning(f"Could not write result cache entry {path.name}: {e}")
+        tmp.unlink(missing_ok=True)
+        return
+    evict_entries()
+
+
+def evict_entries():
+    """Deletes the least recently read entries until the cache directory fits in max_cache_bytes."""
+    entries = []
+    for entry in cache_dir.glob("*.parquet"):
+        try:
+            entries.append((entry.stat(), entry))
+        except FileNotFoundError:
+            continue
+    total = sum(stat.st_size for stat, _ in entries)
+    for stat, entry in sorted(entries, key=lambda item: item[0].st_atime):
+        if total <= max_cache_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        total -= stat.st_size
+
+
+def persist(ttl=default_ttl, version=None):
+    """Caches a DataFrame-returning function's results on disk, under st.cache_data's in-memory cache.
+
+    Args:
+        ttl: Seconds before an entry is recomputed. 0 or None keeps entries until they are evicted.
+        version: Optional callable returning the current version of the data the function reads.
+            Entries written under another version are never read again and age out through eviction.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            path = get_entry_path(func, args, kwargs, version() if version else None)
+            result = read_entry(path, ttl)
+            if result is not None:
+                return result
+            result = func(*args, **kwargs)
+            if isinstance(result, pd.DataFrame):
+                write_entry(path, result)
+            return result
+        return wrapper
+    return decorator
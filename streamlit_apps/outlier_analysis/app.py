@@ -2,7 +2,7 @@ import streamlit as st
 
 st.set_page_config(page_icon="assets/tuva_icon.ico", layout="wide")
 
-from csv_data import get_year_list
+from csv_data import get_year_list, prefetch_around, refresh_sources, start_prewarm
 
 st.markdown(
     """
@@ -44,15 +44,21 @@ st.logo("assets/tuva_logo.png", size="large")
 dashboard_page = st.Page("pages/outliers_cost_driver.py", title="Outlier Cost Driver")
 outliers_by_encounter_page = st.Page("pages/outliers_by_encounter.py", title="Outliers By Encounter")
 outliers_by_diagnosis_page = st.Page("pages/outliers_by_diagnosis.py", title="Outliers By Diagnosis")
+# Cache statistics for maintainers; registered so /diagnostics resolves, but never linked from the sidebar.
+diagnostics_page = st.Page("pages/diagnostics.py", title="Diagnostics", url_path="diagnostics")
 
 # Setup navigation
 app = st.navigation([
-    dashboard_page, outliers_by_encounter_page, outliers_by_diagnosis_page
+    dashboard_page, outliers_by_encounter_page, outliers_by_diagnosis_page, diagnostics_page
     ], position="hidden")
 
 # year_list = get_year_list(st.connection("snowflake"))
 
+# Pick up rows appended to the CSVs since the last run before reading the year list.
+refresh_sources()
 year_list = get_year_list()
+# Warm the most recent years in the background once per server process.
+start_prewarm()
 with st.sidebar:
     selected_year = st.selectbox(
             "Select Year",
@@ -65,4 +71,7 @@ with st.sidebar:
     st.page_link("pages/outliers_by_encounter.py", label="Outliers By Encounter")
     st.page_link("pages/outliers_by_diagnosis.py", label="Outliers By Diagnosis")
 
+# Warm the other pages for this year, and the neighbouring years, while this page renders.
+prefetch_around(selected_year)
+
 app.run()
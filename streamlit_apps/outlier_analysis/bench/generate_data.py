@@ -0,0 +1,233 @@
+"""Write synthetic outlier_claims_agg.csv and outlier_member_months.csv files for benchmarking.
+
+The files have the same columns as the exports in data/. Cardinalities follow the Tuva synthetic data: the
+encounter group/type mix, the share of pharmacy claims without an encounter, the race mix, the 2016-2018 member
+months and the share of claim lines carrying a paid amount. Member, encounter and diagnosis counts grow with the
+row count. Output is written in chunks, so the largest sizes never need to fit in memory.
+
+    python bench/generate_data.py --rows 1m --out bench/data/1m/data
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv
+
+claims_file = "outlier_claims_agg.csv"
+member_months_file = "outlier_member_months.csv"
+
+claims_header = [
+    "CLAIM_TYPE", "MEMBER_ID", "INCR_MONTH", "INCR_YEAR", "DX_CODE", "DX_DESCRIPTION", "DX_CCSR_CATEGORY1",
+    "DX_CCSR_CATEGORY2", "ENCOUNTER_ID", "ENCOUNTER_TYPE", "ENCOUNTER_GROUP", "SERVICE_CATEGORY_1",
+    "SERVICE_CATEGORY_2", "SERVICE_CATEGORY_3", "MS_DRG_CODE", "MS_DRG_DESCRIPTION", "APR_DRG_CODE",
+    "APR_DRG_DESCRIPTION", "REVENUE_CENTER_CODE", "REVENUE_CENTER_DESCRIPTION", "HCPCS_CODE", "RBCS_CAT_DESC",
+    "RBCS_SUBCAT_DESC", "RBCS_FAMILY_DESC", "PAID_AMOUNT", "TOTAL_PAID", "OUTLIER_THRESHOLD", "TOTAL_MEMBERS",
+]
+member_months_header = [
+    "PERSON_ID", "MEMBER_ID", "YEAR", "YEAR_MONTH", "SEX", "RACE", "STATE", "AGE", "AGE_GROUP", "PAYMENT_YEAR",
+    "V24_RISK_SCORE", "POPULATION_NORMALIZED_RISK_SCORE",
+]
+
+years = [2016, 2017, 2018]
+
+# (ENCOUNTER_GROUP, ENCOUNTER_TYPE, share of encounter claim lines) in the Tuva synthetic data.
+encounter_types = [
+    ("inpatient", "acute inpatient", 0.329),
+    ("inpatient", "inpatient hospice", 0.002),
+    ("inpatient", "inpatient skilled nursing", 0.008),
+    ("other", "lab - orphaned", 0.077),
+    ("other", "orphaned claim", 0.009),
+    ("outpatient", "ambulatory surgery center", 0.001),
+    ("outpatient", "emergency department", 0.114),
+    ("outpatient", "home health", 0.023),
+    ("outpatient", "outpatient hospice", 0.006),
+    ("outpatient", "outpatient hospital or clinic", 0.160),
+    ("outpatient", "outpatient injections", 0.121),
+    ("outpatient", "outpatient pt/ot/st", 0.021),
+    ("outpatient", "outpatient radiology", 0.015),
+    ("outpatient", "outpatient surgery", 0.114),
+]
+pharmacy_share = 0.137
+paid_share = 0.26
+lines_per_encounter = 7
+
+races = ["white", "black", "hispanic", "asian", "unknown", "other"]
+race_shares = [0.754, 0.142, 0.034, 0.034, 0.028, 0.008]
+states = [
+    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA",
+    "ME", "MD", "MA", "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK",
+    "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV", "WI", "WY",
+]
+age_groups = [(40, "40-49"), (50, "50-59"), (60, "60-69"), (70, "70-79"), (80, "80-89"), (90, "90+")]
+ccsr_body_systems = 22
+
+# Rows written per chunk; a multiple of lines_per_encounter so no encounter is split across chunks.
+chunk_rows = lines_per_encounter * 150_000
+
+
+def parse_rows(value):
+    """Parse a row count such as 100k, 1m or 50m."""
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+def get_cardinalities(rows):
+    """Get the member, diagnosis and CCSR category counts for a claims file of the given size."""
+    # Every member has all 36 months, so the member months file is about as long as the claims file.
+    members = max(10, rows // 36)
+    diagnoses = min(15_000, max(200, rows // 200))
+    categories = min(530, max(50, diagnoses // 4))
+    return members, diagnoses, categories
+
+
+def pick(rng, values, shares, size):
+    """Draw values with the given shares."""
+    shares = np.asarray(shares, dtype=float)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=size, p=shares / shares.sum())]
+
+
+def write_chunks(path, chunks):
+    """Write frames to one CSV under a single header, without holding more than one frame in memory."""
+    writer = None
+    schema = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema
+                # Like the warehouse exports, values are written unquoted; none of the generated labels has a comma.
+                writer = csv.CSVWriter(path, schema, write_options=csv.WriteOptions(quoting_style="none"))
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def generate_claims(rows, seed):
+    """Yield the claims file in chunks."""
+    members, diagnoses, categories = get_cardinalities(rows)
+    rng = np.random.default_rng(seed)
+    # Yearly totals carried on every row, for a population about seven times the size of the outlier cohort.
+    yearly_totals = {
+        year: (round(members * 7 * rng.uniform(2_000, 3_000), 2), rng.uniform(8_000, 18_000), members * 7)
+        for year in years
+    }
+    # Labels are formatted once and looked up by code, which is much faster than formatting every row.
+    dx_codes = np.array([f"X{code:05d}" for code in range(diagnoses)], dtype=object)
+    dx_descriptions = np.array([f"Synthetic diagnosis {code}" for code in range(diagnoses)], dtype=object)
+    body_systems = np.array([f"Body system {code % ccsr_body_systems}" for code in range(categories)], dtype=object)
+    category_names = np.array([f"CCSR category {code}" for code in range(categories)], dtype=object)
+    groups = [group for group, _, _ in encounter_types]
+    types = [encounter_type for _, encounter_type, _ in encounter_types]
+    type_shares = [share for _, _, share in encounter_types]
+
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        encounter_count = -(-size // lines_per_encounter)
+        # Encounter-level attributes, repeated for each of the encounter's claim lines.
+        first_encounter = start // lines_per_encounter + 1
+        encounter_ids = np.arange(first_encounter, first_encounter + encounter_count)
+        type_index = rng.choice(len(encounter_types), size=encounter_count, p=np.divide(type_shares, sum(type_shares)))
+        per_encounter = pd.DataFrame({
+            "MEMBER_ID": rng.integers(1, members + 1, size=encounter_count),
+            "INCR_YEAR": rng.choice(years, size=encounter_count),
+            "MONTH": rng.integers(1, 13, size=encounter_count),
+            "ENCOUNTER_ID": encounter_ids.astype(float),
+            "ENCOUNTER_GROUP": np.asarray(groups, dtype=object)[type_index],
+            "ENCOUNTER_TYPE": np.asarray(types, dtype=object)[type_index],
+            "PHARMACY": rng.random(encounter_count) < pharmacy_share,
+        })
+        chunk = per_encounter.loc[per_encounter.index.repeat(lines_per_encounter)].iloc[:size].reset_index(drop=True)
+        pharmacy = chunk["PHARMACY"].to_numpy()
+
+        # Diagnoses are skewed toward a few common codes, like real claims.
+        dx = (diagnoses * rng.random(size) ** 3).astype(int)
+        category = dx % categories
+        paid = np.where(
+            rng.random(size) < paid_share, np.round(rng.lognormal(6.2, 1.8, size=size), 2), np.nan
+        )
+        totals = np.array([yearly_totals[year] for year in years], dtype=float)[chunk["INCR_YEAR"].to_numpy() - years[0]]
+
+        data = pd.DataFrame({column: "" for column in claims_header}, index=chunk.index)
+        data["CLAIM_TYPE"] = np.where(pharmacy, "PHARMACY", "institutional")
+        data["MEMBER_ID"] = chunk["MEMBER_ID"]
+        data["INCR_MONTH"] = chunk["INCR_YEAR"] * 100 + chunk["MONTH"]
+        data["INCR_YEAR"] = chunk["INCR_YEAR"]
+        data["DX_CODE"] = dx_codes[dx]
+        data["DX_DESCRIPTION"] = dx_descriptions[dx]
+        data["DX_CCSR_CATEGORY1"] = body_systems[category]
+        data["DX_CCSR_CATEGORY2"] = category_names[category]
+        data["ENCOUNTER_ID"] = chunk["ENCOUNTER_ID"].mask(pharmacy)
+        data["ENCOUNTER_TYPE"] = chunk["ENCOUNTER_TYPE"].mask(pharmacy, "")
+        data["ENCOUNTER_GROUP"] = chunk["ENCOUNTER_GROUP"].mask(pharmacy, "")
+        data["SERVICE_CATEGORY_1"] = data["ENCOUNTER_GROUP"]
+        data["SERVICE_CATEGORY_2"] = data["ENCOUNTER_TYPE"]
+        data["PAID_AMOUNT"] = paid
+        data["TOTAL_PAID"] = totals[:, 0]
+        data["OUTLIER_THRESHOLD"] = totals[:, 1]
+        data["TOTAL_MEMBERS"] = totals[:, 2].astype(int)
+        yield data
+
+
+def generate_member_months(rows, seed):
+    """Yield the member months file in chunks, with every member enrolled for all 36 months."""
+    members, _, _ = get_cardinalities(rows)
+    rng = np.random.default_rng(seed + 1)
+    months_per_member = 12 * len(years)
+    members_per_chunk = max(1, chunk_rows // months_per_member)
+
+    for first in range(1, members + 1, members_per_chunk):
+        member_ids = np.arange(first, min(first + members_per_chunk, members + 1))
+        count = len(member_ids)
+        ages = rng.integers(40, 100, size=count)
+        member = pd.DataFrame({
+            "MEMBER_ID": member_ids,
+            "SEX": pick(rng, ["male", "female"], [0.45, 0.55], count),
+            "RACE": pick(rng, races, race_shares, count),
+            "STATE": np.where(rng.random(count) < 0.014, "", pick(rng, states, np.ones(len(states)), count)),
+            "AGE": ages,
+            "AGE_GROUP": np.asarray([label for _, label in age_groups], dtype=object)[
+                np.digitize(ages, [floor for floor, _ in age_groups]) - 1
+            ],
+        })
+        data = member.loc[member.index.repeat(months_per_member)].reset_index(drop=True)
+        month_index = np.tile(np.arange(months_per_member), count)
+        data["YEAR"] = np.asarray(years)[month_index // 12]
+        data["YEAR_MONTH"] = data["YEAR"] * 100 + month_index % 12 + 1
+        # One risk score per member and year.
+        risk = np.clip(rng.normal(0.47, 0.17, size=count * len(years)), 0, 1).round(3)
+        data["V24_RISK_SCORE"] = np.repeat(risk, 12)
+        data["POPULATION_NORMALIZED_RISK_SCORE"] = (data["V24_RISK_SCORE"] / 0.4585).round(9)
+        data["PERSON_ID"] = data["MEMBER_ID"]
+        data["PAYMENT_YEAR"] = years[-1]
+        yield data[member_months_header]
+
+
+def generate(out_dir, rows, seed=0):
+    """Write both files to out_dir for a claims file of the given number of rows."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    write_chunks(out_dir / claims_file, generate_claims(rows, seed))
+    write_chunks(out_dir / member_months_file, generate_member_months(rows, seed))
+    return out_dir
+
+
+def main():
+    """Parse the command line and write the files."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", required=True, help="Claim rows to write, e.g. 100k, 1m, 10m or 50m")
+    parser.add_argument("--out", required=True, help="Directory to write the two CSVs to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    out_dir = generate(args.out, parse_rows(args.rows), args.seed)
+    print(f"Wrote {out_dir} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
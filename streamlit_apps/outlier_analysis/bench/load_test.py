@@ -0,0 +1,195 @@
+"""Measure how rerun latency degrades as more sessions use the outlier app at once.
+
+Each session count runs in a fresh process, like a freshly started server. The process drives that many
+AppTest sessions of app.py from parallel threads, sharing one set of caches as a server's sessions do. Every
+session repeats random analyst actions: switching the year, navigating to another page, and moving the
+`Number of Diagnoses to Show` slider on Outliers By Diagnosis. The time of every rerun is recorded. Latencies
+include AppTest's own overhead of running the script and collecting its elements, so compare them between runs
+rather than with browser timings.
+
+For each session count, one JSON line is appended to the output with p50/p95/p99 rerun latency, throughput
+(reruns per second across all sessions), resident memory and peak RSS.
+
+    python bench/load_test.py --sessions 1 5 10 25 [--data-dir bench/data/1m]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from run_benchmarks import app_dir, bench_dir, get_commit, get_peak_rss_mb
+
+pages = ["pages/outliers_cost_driver.py", "pages/outliers_by_encounter.py", "pages/outliers_by_diagnosis.py"]
+top_n_range = (10, 500)
+
+
+def get_rss_mb():
+    """Get the current resident set size of this process in MB, or the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return get_peak_rss_mb()
+
+
+def percentile(values, percent):
+    """Get the value below which the given percentage of values fall."""
+    if len(values) < 2:
+        return values[0] if values else None
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def round_or_none(value, digits):
+    """Round a value that is None when a run had nothing to measure, such as when every rerun failed."""
+    return None if value is None else round(value, digits)
+
+
+def format_seconds(value):
+    """Format a latency for the results table, or "-" when there is none."""
+    return "-" if value is None else f"{value:.3f}"
+
+
+def run_session(seed, actions, barrier, latencies, errors):
+    """Open the app in one AppTest session and time each rerun of a random sequence of actions."""
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(str(app_dir / "app.py"), default_timeout=300)
+    page = pages[0]
+    barrier.wait()
+
+    def rerun(action):
+        start = time.perf_counter()
+        action.run()
+        latencies.append(time.perf_counter() - start)
+        if at.exception:
+            errors.append(at.exception[0].message)
+
+    try:
+        rerun(at)
+        years = [int(year) for year in at.selectbox(key="selected_year").options]
+        for _ in range(actions):
+            choice = rng.random()
+            if choice < 0.4:
+                page = rng.choice([other for other in pages if other != page])
+                rerun(at.switch_page(page))
+            elif choice < 0.7 or not at.sidebar.slider:
+                # Only Outliers By Diagnosis has a slider, so on other pages the year is switched instead.
+                # After switch_page, AppTest no longer lists the sidebar's year selectbox, so the choice is made
+                # through its session state key, which is what the selectbox writes to.
+                at.session_state["selected_year"] = rng.choice(years)
+                rerun(at)
+            else:
+                rerun(at.sidebar.slider[0].set_value(rng.randint(*top_n_range)))
+    except Exception as e:
+        # A failed session stops early; it is counted as an error rather than stopping the other sessions.
+        errors.append(repr(e))
+
+
+def share_script_cache():
+    """Make every AppTest session use one compiled-script cache, as a server's sessions do."""
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    # AppTest compiles the scripts again on every run. Besides timing compilation a server does once,
+    # compiling from several threads at once can fail in CPython 3.11's AST constructor.
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def run_worker(args):
+    """Run one session count in this process and append its summary to the output file."""
+    os.chdir(args.workdir)
+    share_script_cache()
+    baseline_mb = get_rss_mb()
+    latencies = []
+    errors = []
+    barrier = threading.Barrier(args.session_count + 1)
+    threads = [
+        threading.Thread(target=run_session, args=(args.seed + index, args.actions, barrier, latencies, errors))
+        for index in range(args.session_count)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    rss_mb = get_rss_mb()
+
+    result = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data_dir": str(args.workdir),
+        "sessions": args.session_count,
+        "actions_per_session": args.actions,
+        "reruns": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(seconds, 3),
+        "reruns_per_second": round(len(latencies) / seconds, 3),
+        **{f"p{percent}_seconds": round_or_none(percentile(latencies, percent), 4) for percent in (50, 95, 99)},
+        "rss_mb": round(rss_mb, 1),
+        "rss_mb_per_session": round((rss_mb - baseline_mb) / args.session_count, 1),
+        "peak_rss_mb": round(get_peak_rss_mb(), 1),
+    }
+    with open(args.output, "a") as output:
+        output.write(json.dumps(result) + "\n")
+
+
+def main():
+    """Parse the command line, then run every session count in its own process, or run one worker."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10], help="Concurrent session counts")
+    parser.add_argument("--actions", type=int, default=20, help="Actions each session performs after opening the app")
+    parser.add_argument("--data-dir", default=str(app_dir), help="Folder with a data/ folder of CSVs to serve")
+    parser.add_argument("--output", default=str(bench_dir / "load_results.jsonl"), help="JSON lines file to append to")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--session-count", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    workdir = Path(args.data_dir).resolve()
+    # app.py loads its logo and icon from assets/ relative to the working directory.
+    if not (workdir / "assets").exists():
+        (workdir / "assets").symlink_to(app_dir / "assets", target_is_directory=True)
+    output = Path(args.output).resolve()
+    print(
+        f"{'SESSIONS':>8} {'RERUNS':>7} {'ERRORS':>7} {'RERUN/S':>8} {'P50 S':>7} {'P95 S':>7} {'P99 S':>7} "
+        f"{'RSS MB':>8} {'MB/SESSION':>10}"
+    )
+    for session_count in args.sessions:
+        command = [
+            sys.executable, __file__, "--worker", "--workdir", str(workdir), "--session-count", str(session_count),
+            "--actions", str(args.actions), "--seed", str(args.seed), "--output", str(output),
+        ]
+        completed = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+        if completed.returncode:
+            raise RuntimeError(f"{session_count} sessions failed:\n{completed.stderr[-2000:]}")
+        with open(output) as results:
+            result = json.loads(results.readlines()[-1])
+        print(
+            f"{result['sessions']:>8} {result['reruns']:>7} {result['errors']:>7} {result['reruns_per_second']:>8.2f} "
+            f"{format_seconds(result['p50_seconds']):>7} {format_seconds(result['p95_seconds']):>7} "
+            f"{format_seconds(result['p99_seconds']):>7} "
+            f"{result['rss_mb']:>8.1f} {result['rss_mb_per_session']:>10.1f}"
+        )
+        if result["errors"]:
+            print(f"{result['errors']} reruns raised, first: {result['first_error']}")
+    print(f"Results appended to {output}")
+
+
+if __name__ == "__main__":
+    main()
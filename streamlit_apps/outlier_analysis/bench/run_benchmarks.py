@@ -0,0 +1,183 @@
+"""Time every outlier data accessor on synthetic data of increasing size.
+
+Each size is generated once into bench/data/. Each engine then runs in two fresh processes. The first starts
+without the Parquet sidecars, so its "cold" pass includes parsing the CSVs. The second starts with whatever the
+first left behind, so its "restart" pass is what a restarted server pays. Both processes then repeat every call
+for the "warm" pass. The persisted result cache is turned off so every pass measures computation.
+
+Every call is appended to the output file as one JSON line, with its wall time and the process's peak RSS so
+far. A summary table is printed at the end.
+
+    python bench/run_benchmarks.py --sizes 100k 1m 10m 50m --engines pandas streaming compact duckdb
+"""
+import argparse
+import functools
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import generate_data
+
+bench_dir = Path(__file__).resolve().parent
+app_dir = bench_dir.parent
+
+# Settings each engine runs with. "pandas" and "streaming" are csv_data.py's two modes, and "compact" is the
+# first with narrowed numeric dtypes; "duckdb" runs snowflake_data.py's SQL through local_engine.py.
+engines = {
+    "pandas": {"OUTLIER_STREAMING": "0"},
+    "streaming": {"OUTLIER_STREAMING": "1"},
+    "compact": {"OUTLIER_STREAMING": "0", "OUTLIER_COMPACT_NUMBERS": "1"},
+    "duckdb": {},
+}
+
+
+def get_peak_rss_mb():
+    """Get the peak resident set size of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes.
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def get_commit():
+    """Get the short hash of the checked-out commit, or None outside a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=app_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_accessors(engine):
+    """Get (name, function of year) pairs for every public accessor of an engine, in page order."""
+    if engine == "duckdb":
+        import snowflake_data
+        from local_engine import get_local_connection
+
+        conn = get_local_connection()
+        functions = [
+            snowflake_data.get_cost_driver_data,
+            snowflake_data.get_outlier_members_count,
+            snowflake_data.get_encounter_count,
+            *snowflake_data.encounter_page_queries.values(),
+            *snowflake_data.diagnosis_page_queries.values(),
+        ]
+        return [
+            ("get_year_list", lambda year: snowflake_data.get_year_list(conn)),
+            *((func.__name__, functools.partial(func, conn)) for func in functions),
+        ]
+
+    import csv_data
+
+    functions = [
+        csv_data.get_metrics_data_csv,
+        csv_data.get_member_count,
+        csv_data.get_member_months_count,
+        csv_data.get_v24_risk_score_csv,
+        csv_data.get_outlier_population_by_race_csv,
+        csv_data.get_outlier_population_by_state_csv,
+        csv_data.get_encounter_count,
+        csv_data.get_pmpm_and_encounters_by_group_csv,
+        csv_data.get_pmpm_and_encounters_by_type_csv,
+        csv_data.get_pmpm_by_diagnosis_category_csv,
+        csv_data.get_pmpm_by_diagnosis_csv,
+    ]
+    return [("get_year_list", lambda year: csv_data.get_year_list()), *((func.__name__, func) for func in functions)]
+
+
+def run_worker(args):
+    """Time every accessor twice in this process and append the results to the output file."""
+    os.chdir(args.workdir)
+    sys.path.insert(0, str(app_dir))
+    accessors = get_accessors(args.engine)
+    record = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "size": args.size,
+        "rows": generate_data.parse_rows(args.size),
+        "engine": args.engine,
+        "year": args.year,
+    }
+    # Line buffered, so the calls that finished are kept if a later one fails.
+    with open(args.output, "a", buffering=1) as output:
+        for phase in (args.phase, "warm"):
+            for name, func in accessors:
+                start = time.perf_counter()
+                func(args.year)
+                seconds = time.perf_counter() - start
+                result = {**record, "phase": phase, "function": name, "seconds": round(seconds, 6)}
+                output.write(json.dumps({**result, "peak_rss_mb": round(get_peak_rss_mb(), 1)}) + "\n")
+
+
+def run_engine(workdir, size, engine, year, output):
+    """Run the cold and restart processes for one engine on one generated size."""
+    shutil.rmtree(workdir / "data" / ".cache", ignore_errors=True)
+    env = {**os.environ, **engines[engine], "RESULT_CACHE": "0", "OUTLIER_SUMMARIES": "0"}
+    command = [
+        sys.executable, __file__, "--worker", "--workdir", str(workdir), "--size", size,
+        "--engine", engine, "--year", str(year), "--output", str(output),
+    ]
+    # The phase is named by the run rather than by the sidecars on disk, since the duckdb engine writes none.
+    for phase in ("cold", "restart"):
+        completed = subprocess.run([*command, "--phase", phase], env=env, stderr=subprocess.PIPE, text=True)
+        if completed.returncode:
+            raise RuntimeError(f"{engine} on {size} failed:\n{completed.stderr[-2000:]}")
+
+
+def print_summary(output, started):
+    """Print the total time and peak RSS of each size, engine and phase recorded since started."""
+    totals = {}
+    with open(output) as results:
+        for line in results:
+            result = json.loads(line)
+            if result["timestamp"] < started:
+                continue
+            key = (result["size"], result["engine"], result["phase"])
+            seconds, peak = totals.get(key, (0.0, 0.0))
+            totals[key] = (seconds + result["seconds"], max(peak, result["peak_rss_mb"]))
+    print(f"{'SIZE':>6}  {'ENGINE':<10} {'PHASE':<8} {'SECONDS':>10} {'PEAK RSS MB':>12}")
+    for (size, engine, phase), (seconds, peak) in totals.items():
+        print(f"{size:>6}  {engine:<10} {phase:<8} {seconds:>10.3f} {peak:>12.1f}")
+
+
+def main():
+    """Parse the command line, then generate data and run the benchmarks, or run one worker."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["100k", "1m"], help="Claim row counts, e.g. 100k 1m 10m 50m")
+    parser.add_argument("--engines", nargs="+", default=list(engines), choices=list(engines))
+    parser.add_argument("--year", type=int, default=generate_data.years[-1], help="Year every accessor is called for")
+    parser.add_argument("--data-dir", default=str(bench_dir / "data"), help="Where generated sizes are kept")
+    parser.add_argument("--output", default=str(bench_dir / "results.jsonl"), help="JSON lines file to append to")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--size", help=argparse.SUPPRESS)
+    parser.add_argument("--engine", help=argparse.SUPPRESS)
+    parser.add_argument("--phase", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    started = time.strftime("%Y-%m-%dT%H:%M:%S")
+    output = Path(args.output).resolve()
+    for size in args.sizes:
+        # Each size is laid out like the app folder, so csv_data.py's relative data/ paths resolve inside it.
+        workdir = Path(args.data_dir).resolve() / size
+        if not (workdir / "data" / generate_data.claims_file).exists():
+            print(f"Generating {size} rows in {workdir / 'data'}")
+            generate_data.generate(workdir / "data", generate_data.parse_rows(size))
+        for engine in args.engines:
+            print(f"Benchmarking {engine} on {size} rows")
+            run_engine(workdir, size, engine, args.year, output)
+    print_summary(output, started)
+    print(f"Results appended to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Build the per-year summary tables the outlier pages read when OUTLIER_SUMMARIES=1.
+
+Run from this folder after the CSVs in data/ change:
+
+    python build_summaries.py [--years 2018 2017]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import csv_data
+
+# Add the repo root to sys.path so we can import shared modules
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from shared.utils import result_cache
+
+
+def build_summaries(years):
+    """Compute every summary table for the given years from the sources and write them to the summary store."""
+    # Always compute from the sources, and skip the result cache, which would only hold a second copy.
+    csv_data.use_summaries = False
+    result_cache.enabled = False
+    paths = []
+    for name, func in csv_data.summary_functions.items():
+        for year in years:
+            paths.append(csv_data.write_summary(name, year, func(year)))
+    return paths
+
+
+def main():
+    """Parse the command line and build the summaries."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", help="Years to build (default: every year in the data)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    years = args.years or csv_data.get_year_list()
+    paths = build_summaries(years)
+    total_bytes = sum(path.stat().st_size for path in paths)
+    print(
+        f"Wrote {len(paths)} summaries for {len(years)} years to {csv_data.summary_dir} "
+        f"({total_bytes / 1024:,.1f} KB) in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
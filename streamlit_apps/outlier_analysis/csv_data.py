@@ -1,159 +1,699 @@
+import functools
+import hashlib
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 import streamlit as st
+from streamlit.logger import get_logger
+from utils import env_flag
+
+# Add the repo root to sys.path so we can import shared modules
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from shared.utils import cache_stats, result_cache
+
+logger = get_logger(__name__)
+
+# Columnar copies of the source CSVs live here so text is only parsed once.
+sidecar_dir = Path("data/.cache")
 
 
-@st.cache_data
-def load_data(file):
+def get_sidecar_path(file):
+    """Get the Parquet sidecar path for a CSV, keyed by the source file's size and mtime."""
+    source = Path(file)
+    stat = source.stat()
+    return sidecar_dir / f"{source.stem}-{stat.st_size}-{stat.st_mtime_ns}.parquet"
+
+def get_tmp_path(path):
+    """Get a temp file path next to path that no other process or thread writes to."""
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def write_sidecar(file, sidecar):
+    """Parse the CSV once and write it to a Parquet sidecar, replacing stale copies."""
+    data = pd.read_csv(file)
+    # Write to a temp file first so a crashed process never leaves a partial sidecar behind. The name is unique
+    # to the process and thread, so servers starting together never write to the same temp file.
+    tmp_path = get_tmp_path(sidecar)
+    try:
+        sidecar.parent.mkdir(parents=True, exist_ok=True)
+        for stale in sidecar.parent.glob(f"{Path(file).stem}-*.parquet"):
+            # Another process may have just published the current sidecar, and may be reading it.
+            if stale != sidecar:
+                stale.unlink(missing_ok=True)
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, sidecar)
+    except OSError as e:
+        st.warning(f"Could not write columnar cache for {file}: {e}")
+        tmp_path.unlink(missing_ok=True)
+    return data
+
+def load_data(file, columns=None):
+    """Load a CSV through its Parquet sidecar, reading only the requested columns."""
     try:
-        data = pd.read_csv(file)
-        return data
+        sidecar = get_sidecar_path(file)
+        if not sidecar.exists():
+            data = write_sidecar(file, sidecar)
+            return data[columns] if columns else data
+        return pd.read_parquet(sidecar, columns=columns)
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()
-    
 
+
+# Low-cardinality text columns are dictionary-encoded at ingest so groupby, fillna and nunique work on codes.
+use_categoricals = env_flag("OUTLIER_CATEGORICALS", default=True)
+categorical_columns = [
+    "ENCOUNTER_GROUP",
+    "ENCOUNTER_TYPE",
+    "DX_CCSR_CATEGORY2",
+    "DX_DESCRIPTION",
+    "STATE",
+    "RACE",
+    "SEX",
+]
+
+# Opt-in: numeric columns are narrowed to the smallest type that holds every value exactly, e.g. YEAR to int16.
+use_compact_numbers = env_flag("OUTLIER_COMPACT_NUMBERS", default=False)
+# Floats are narrowed to float32 only if they are written with at most this many decimal places and every value
+# still rounds to the same number at that precision after the round trip.
+max_compact_decimals = 6
+# Decimal places each narrowed float column was written with, so widen() can restore its exact values.
+compact_float_decimals = {}
+
+# One row per converted column, filled in as frames are ingested.
+memory_report_rows = []
+# Each named frame's total size before and after the dtype policies, keyed by frame name.
+frame_memory_report = {}
+
+
+def record_column(frame_name, column, before, after):
+    """Add a converted column's dtypes and bytes before and after to the memory report."""
+    bytes_before = before.memory_usage(index=False, deep=True)
+    bytes_after = after.memory_usage(index=False, deep=True)
+    memory_report_rows.append({
+        "FRAME": frame_name,
+        "COLUMN": column,
+        "DTYPE_BEFORE": str(before.dtype),
+        "DTYPE_AFTER": str(after.dtype),
+        "BYTES_BEFORE": bytes_before,
+        "BYTES_AFTER": bytes_after,
+        "BYTES_SAVED": bytes_before - bytes_after,
+    })
+
+def to_categoricals(data, frame_name=None):
+    """Convert the low-cardinality text columns to categoricals with an explicit 'null' category."""
+    for column in categorical_columns:
+        if column not in data.columns or isinstance(data[column].dtype, pd.CategoricalDtype):
+            continue
+        before = data[column]
+        encoded = before.astype("category")
+        if "null" not in encoded.cat.categories:
+            encoded = encoded.cat.add_categories("null")
+        data[column] = encoded
+        if frame_name:
+            record_column(frame_name, column, before, encoded)
+    return data
+
+def get_decimals(values):
+    """Get the fewest decimal places that every value is written with, or None if it is more than the maximum."""
+    for decimals in range(max_compact_decimals + 1):
+        if np.allclose(np.round(values, decimals), values, rtol=1e-12, atol=0):
+            return decimals
+    return None
+
+def get_compact_dtype(values, known_decimals=None):
+    """Get the smallest dtype that holds every value of a numeric column, and a float's decimals, or (None, None).
+
+    known_decimals is the precision earlier frames of the column were narrowed at. widen() rounds every frame of
+    the column to it, so a new frame is only narrowed if it is written with no more decimals than that.
+    """
+    dtype = values.dtype
+    if not isinstance(dtype, np.dtype) or dtype.kind not in "iuf":
+        return None, None
+    array = values.to_numpy()
+    if dtype.kind in "iu":
+        if not len(array):
+            return None, None
+        low, high = array.min(), array.max()
+        # Overflow check: the narrowed type must hold the column's full range.
+        for candidate in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(candidate)
+            if info.min <= low and high <= info.max:
+                return (candidate, None) if np.dtype(candidate).itemsize < dtype.itemsize else (None, None)
+        return None, None
+    if dtype != np.float64:
+        return None, None
+    finite = array[np.isfinite(array)]
+    if np.abs(finite).max(initial=0) > np.finfo(np.float32).max:
+        return None, None
+    # Precision check: after the round trip every value must still round to itself at its written precision.
+    decimals = get_decimals(finite)
+    if decimals is None:
+        return None, None
+    if known_decimals is not None:
+        if decimals > known_decimals:
+            return None, None
+        decimals = known_decimals
+    round_trip = finite.astype(np.float32).astype(np.float64)
+    if not np.array_equal(np.round(round_trip, decimals), np.round(finite, decimals)):
+        return None, None
+    return np.float32, decimals
+
+def to_compact_numbers(data, frame_name=None):
+    """Narrow each numeric column to the smallest dtype that still holds all of its values exactly."""
+    for column in data.columns:
+        dtype, decimals = get_compact_dtype(data[column], compact_float_decimals.get(column))
+        if dtype is None:
+            continue
+        before = data[column]
+        data[column] = before.astype(dtype)
+        if decimals is not None:
+            compact_float_decimals.setdefault(column, decimals)
+        if frame_name:
+            record_column(frame_name, column, before, data[column])
+    return data
+
+def widen(data):
+    """Get a frame with its narrowed float columns back in float64, rounded to the decimals they were written with.
+
+    Sums and statistics are computed on widened columns, so they match the uncompacted results.
+    """
+    widened = {
+        column: data[column].astype(np.float64).round(compact_float_decimals[column])
+        for column in data.columns
+        if column in compact_float_decimals and data[column].dtype == np.float32
+    }
+    return data.assign(**widened) if widened else data
+
+def get_memory_report():
+    """Get the bytes saved per column by the categorical and compact number ingest modes."""
+    return pd.DataFrame(memory_report_rows, columns=[
+        "FRAME", "COLUMN", "DTYPE_BEFORE", "DTYPE_AFTER", "BYTES_BEFORE", "BYTES_AFTER", "BYTES_SAVED",
+    ])
+
+def get_frame_memory_report():
+    """Get each ingested frame's rows and total bytes before and after the ingest dtype policies."""
+    return pd.DataFrame(
+        frame_memory_report.values(), columns=["FRAME", "ROWS", "BYTES_BEFORE", "BYTES_AFTER", "BYTES_SAVED"]
+    )
+
+def ingest(data, frame_name=None, categoricals=True):
+    """Apply the ingest-time dtype policies to a freshly loaded frame; only named frames are reported."""
+    if frame_name:
+        memory_report_rows[:] = [row for row in memory_report_rows if row["FRAME"] != frame_name]
+        bytes_before = data.memory_usage(index=False, deep=True).sum()
+    if use_categoricals and categoricals:
+        data = to_categoricals(data, frame_name)
+    if use_compact_numbers:
+        data = to_compact_numbers(data, frame_name)
+    if frame_name:
+        bytes_after = data.memory_usage(index=False, deep=True).sum()
+        frame_memory_report[frame_name] = {
+            "FRAME": frame_name,
+            "ROWS": len(data),
+            "BYTES_BEFORE": bytes_before,
+            "BYTES_AFTER": bytes_after,
+            "BYTES_SAVED": bytes_before - bytes_after,
+        }
+    return data
+
+def concat_frames(frames):
+    """Concatenate frames, widening categoricals to a shared sorted category set so they stay categorical."""
+    for column in frames[0].columns:
+        if not any(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            continue
+        categories = pd.Index([])
+        for frame in frames:
+            values = frame[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                categories = categories.union(values.cat.categories)
+            else:
+                categories = categories.union(pd.Index(values.dropna().unique()))
+        dtype = pd.CategoricalDtype(categories)
+        frames = [frame.astype({column: dtype}) for frame in frames]
+    # A narrowed float column joined with frames where it stayed float64, like appended rows that could not be
+    # narrowed, is widened first. Otherwise the float64 result would keep the float32 rounding noise.
+    for column in frames[0].columns:
+        dtypes = {frame[column].dtype for frame in frames}
+        if column in compact_float_decimals and np.dtype(np.float32) in dtypes and len(dtypes) > 1:
+            frames = [widen(frame) for frame in frames]
+            break
+    return pd.concat(frames, ignore_index=True)
+
+
+class YearPartition:
+    """A frame sorted by year with row offsets, so each year is one contiguous slice."""
+
+    def __init__(self, data, year_column):
+        self.year_column = year_column
+        self._index = self._build(data)
+
+    def _build(self, data):
+        offsets = {}
+        if data.empty or self.year_column not in data.columns:
+            return data, offsets
+
+        # Sort once at load; rows with a missing year sort last and are left out of the index.
+        data = data.sort_values(self.year_column, kind="stable", ignore_index=True)
+        year_counts = data[self.year_column].value_counts(sort=False).sort_index()
+        start = 0
+        for year, count in year_counts.items():
+            offsets[int(year)] = (start, start + count)
+            start += count
+        return data, offsets
+
+    @property
+    def data(self):
+        return self._index[0]
+
+    @property
+    def offsets(self):
+        return self._index[1]
+
+    @property
+    def years(self):
+        return list(self.offsets)
+
+    def get(self, year):
+        """Get the rows for a year without scanning the rest of the frame."""
+        # Read the frame and offsets together so a concurrent replace_years never mixes the two.
+        data, offsets = self._index
+        try:
+            start, end = offsets.get(int(year), (0, 0))
+        except (TypeError, ValueError):
+            start, end = (0, 0)
+        return data.iloc[start:end]
+
+    def get_many(self, years):
+        """Get the rows for several years as one frame."""
+        return concat_frames([self.data.iloc[0:0], *(self.get(year) for year in years)])
+
+    def replace_years(self, years, rows):
+        """Swap in new rows for the given years, leaving every other year's rows as they are."""
+        kept = [self.get(year) for year in self.years if year not in years]
+        self._index = self._build(concat_frames([*kept, rows]))
+
+
+# Nothing is read at import time; each frame is loaded on the first accessor call that needs it,
+# and only the columns the accessors below actually use are read.
 agg_claim_path = "data/outlier_claims_agg.csv"
-outlier_claims_agg_data = load_data(agg_claim_path)
+claims_columns = [
+    "INCR_YEAR",
+    "ENCOUNTER_ID",
+    "ENCOUNTER_GROUP",
+    "ENCOUNTER_TYPE",
+    "DX_CCSR_CATEGORY2",
+    "DX_DESCRIPTION",
+    "PAID_AMOUNT",
+    "TOTAL_PAID",
+    "OUTLIER_THRESHOLD",
+    "TOTAL_MEMBERS",
+]
 
 outlier_member_path = "data/outlier_member_months.csv"
-outlier_member_months_data = load_data(outlier_member_path)
+member_months_columns = [
+    "YEAR",
+    "MEMBER_ID",
+    "YEAR_MONTH",
+    "SEX",
+    "RACE",
+    "STATE",
+    "AGE",
+    "V24_RISK_SCORE",
+]
+
+# One row per load stage, so the startup cost can be broken down by frame and step.
+load_timings = []
+
+
+@contextmanager
+def record_timing(frame_name, stage):
+    """Time a load stage and log it."""
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    load_timings.append({"FRAME": frame_name, "STAGE": stage, "SECONDS": seconds})
+    logger.info("Loaded %s: %s took %.3fs", frame_name, stage, seconds)
+
+def get_load_timings():
+    """Get the startup timing breakdown of every load stage run so far."""
+    return pd.DataFrame(load_timings, columns=["FRAME", "STAGE", "SECONDS"])
+
+def read_frame(file, columns, frame_name):
+    """Read and ingest one source frame, recording the time spent in each step."""
+    track_source(file)
+    with record_timing(frame_name, "read"):
+        data = load_data(file, columns)
+    with record_timing(frame_name, "ingest"):
+        return ingest(data, frame_name)
+
+@st.cache_resource
+def get_member_months_partition():
+    """Get the year-partitioned member months frame, loading it on first use."""
+    data = read_frame(outlier_member_path, member_months_columns, "outlier_member_months")
+    with record_timing("outlier_member_months", "partition"):
+        return YearPartition(data, "YEAR")
 
 def get_year_list():
     """Get the list of years available in the dataset."""
-    return sorted(outlier_member_months_data['YEAR'].unique().tolist(), reverse=True)
+    if outlier_member_path in source_states:
+        return sorted(get_member_months_partition().years, reverse=True)
+    # Until the member months frame is loaded, only its YEAR column is read so the sidebar renders first.
+    with record_timing("outlier_member_months", "year list"):
+        years = load_data(outlier_member_path, ["YEAR"])["YEAR"].dropna().unique()
+    return sorted((int(year) for year in years), reverse=True)
+
+# CLAIMS ROLLUP #
+
+# Claim rows are reduced to per-year aggregates: paid sums by encounter group/type and diagnosis, the
+# distinct encounter keys needed for exact encounter counts, and the yearly totals. Every claims accessor
+# reads these, so the in-memory and streaming modes return the same results.
+use_streaming = env_flag("OUTLIER_STREAMING", default=False)
+stream_chunk_rows = int(os.environ.get("OUTLIER_CHUNK_ROWS", 1_000_000))
+
+encounter_keys = ["INCR_YEAR", "ENCOUNTER_GROUP", "ENCOUNTER_TYPE"]
+paid_rollups = {
+    "paid_by_type": ["INCR_YEAR", "ENCOUNTER_GROUP", "ENCOUNTER_TYPE"],
+    "paid_by_dx_category": ["INCR_YEAR", "DX_CCSR_CATEGORY2"],
+    "paid_by_dx": ["INCR_YEAR", "DX_DESCRIPTION"],
+}
+yearly_total_columns = ["TOTAL_MEMBERS", "TOTAL_PAID", "OUTLIER_THRESHOLD"]
+
+
+def fold_claims(claims):
+    """Reduce claim rows to the per-year aggregates the claims accessors are computed from."""
+    claims = widen(claims).fillna({column: "null" for column in ["ENCOUNTER_GROUP", "ENCOUNTER_TYPE", "DX_CCSR_CATEGORY2", "DX_DESCRIPTION"]})
+    rollup = {
+        name: claims.groupby(keys, as_index=False, observed=True)["PAID_AMOUNT"].sum()
+        for name, keys in paid_rollups.items()
+    }
+    rollup["encounters"] = claims[[*encounter_keys, "ENCOUNTER_ID"]].dropna(subset=["ENCOUNTER_ID"]).drop_duplicates()
+    # The claims extract repeats the yearly totals on every row, so the first row of each year carries them.
+    rollup["first_rows"] = claims[["INCR_YEAR", *yearly_total_columns]].dropna(subset=["INCR_YEAR"]).drop_duplicates("INCR_YEAR")
+    return rollup
+
+def merge_rollups(rollups):
+    """Combine claims rollups in one pass, keeping the earliest one's first row for each year."""
+    merged = {
+        name: concat_frames([rollup[name] for rollup in rollups])
+        .groupby(keys, as_index=False, observed=True)["PAID_AMOUNT"].sum()
+        for name, keys in paid_rollups.items()
+    }
+    merged["encounters"] = concat_frames([rollup["encounters"] for rollup in rollups]).drop_duplicates()
+    merged["first_rows"] = concat_frames([rollup["first_rows"] for rollup in rollups]).drop_duplicates("INCR_YEAR")
+    return merged
+
+def stream_claims_rollup(file):
+    """Fold the claims CSV into a rollup chunk by chunk, never holding more than one chunk of raw rows."""
+    chunk_rollups = []
+    try:
+        for chunk in pd.read_csv(file, usecols=claims_columns, chunksize=stream_chunk_rows):
+            chunk_rollups.append(fold_claims(chunk))
+    except Exception as e:
+        # As in load_data, a failed read gives an empty rollup rather than the totals of the chunks read so far.
+        st.error(f"Error loading data: {e}")
+        chunk_rollups = []
+    if not chunk_rollups:
+        return fold_claims(pd.DataFrame(columns=claims_columns))
+    # Each chunk's rollup is already reduced, so they are merged and deduplicated once at the end.
+    return merge_rollups(chunk_rollups)
+
+@st.cache_resource
+def get_claims_rollup():
+    """Get the year-partitioned claims rollup, built from the full frame or by streaming the CSV in chunks."""
+    if use_streaming:
+        track_source(agg_claim_path)
+        with record_timing("outlier_claims_agg", "stream"):
+            rollup = stream_claims_rollup(agg_claim_path)
+    else:
+        claims = read_frame(agg_claim_path, claims_columns, "outlier_claims_agg")
+        with record_timing("outlier_claims_agg", "rollup"):
+            rollup = fold_claims(claims)
+    # The distinct encounter keys are the one rollup frame that grows with the claims, so it is narrowed too.
+    # The paid sums are a few rows per group and stay float64.
+    with record_timing("outlier_claims_agg", "ingest encounters"):
+        rollup["encounters"] = ingest(rollup["encounters"], "outlier_claims_agg.encounters", categoricals=False)
+    with record_timing("outlier_claims_agg", "partition"):
+        return {name: YearPartition(frame, "INCR_YEAR") for name, frame in rollup.items()}
+
+def get_year_rollup(year):
+    """Get the slice of every claims rollup frame for a year."""
+    return {name: partition.get(year) for name, partition in get_claims_rollup().items()}
+
+def summarize_encounters(rollup, keys):
+    """Get the paid amount and distinct encounter count per key from a year's rollup."""
+    paid = rollup["paid_by_type"].groupby(keys, as_index=False, observed=True)["PAID_AMOUNT"].sum()
+    encounter_counts = (
+        rollup["encounters"]
+        .groupby(keys, observed=True)["ENCOUNTER_ID"]
+        .nunique()
+        .reset_index(name="ENCOUNTER_COUNT")
+    )
+    return paid.merge(encounter_counts, on=keys, how="left").fillna({"ENCOUNTER_COUNT": 0})
+
+# OUTLIER COST DRIVER #
+
+population_columns = ['MEMBER_COUNT', 'PERCENTAGE']
+
+def get_population_by_year(member_months, column):
+    """Get the distinct member count and percentage per value of a column, split by year."""
+    filtered_data = member_months[member_months[column].notnull()]
+    population = (
+        filtered_data
+        .groupby(['YEAR', column], observed=True)['MEMBER_ID']
+        .nunique()
+        .reset_index(name='MEMBER_COUNT')
+    )
+    population['PERCENTAGE'] = (
+        population['MEMBER_COUNT'] / population.groupby('YEAR')['MEMBER_COUNT'].transform('sum') * 100
+    ).round(2)
+
+    by_year = {}
+    for year, population_by_year in population.groupby('YEAR'):
+        by_year[int(year)] = (
+            population_by_year[[column, *population_columns]]
+            .sort_values('PERCENTAGE')
+        )
+    return by_year
+
+def build_metrics_cube(member_months, claims_rollup):
+    """Compute every Outlier Cost Driver KPI for every year in one vectorized pass."""
+    member_months = widen(member_months)
+    by_year = member_months.groupby('YEAR')
+    member_metrics = pd.DataFrame({
+        'MEMBER_COUNT': by_year['MEMBER_ID'].nunique(),
+        'MEMBER_MONTHS': member_months.drop_duplicates(['YEAR', 'MEMBER_ID', 'YEAR_MONTH']).groupby('YEAR').size(),
+        'MEAN_AGE': by_year['AGE'].mean(),
+        'FEMALE_COUNT': member_months[member_months['SEX'] == 'female'].groupby('YEAR')['MEMBER_ID'].nunique(),
+        'V24_RISK_MEAN': by_year['V24_RISK_SCORE'].mean(),
+        'V24_RISK_MEDIAN': by_year['V24_RISK_SCORE'].median(),
+        'V24_RISK_MIN': by_year['V24_RISK_SCORE'].min(),
+        'V24_RISK_MAX': by_year['V24_RISK_SCORE'].max(),
+    })
+
+    first_rows = claims_rollup['first_rows'].set_index('INCR_YEAR')
+    claims_metrics = pd.DataFrame({
+        'TOTAL_COUNT': first_rows['TOTAL_MEMBERS'],
+        'TOTAL_PAID_AMOUNT': first_rows['TOTAL_PAID'],
+        'OUTLIER_THRESHOLD': first_rows['OUTLIER_THRESHOLD'],
+        'TOTAL_OUTLIER_PAID': claims_rollup['paid_by_type'].groupby('INCR_YEAR')['PAID_AMOUNT'].sum(),
+        'TOTAL_ENCOUNTERS': claims_rollup['encounters'].groupby('INCR_YEAR')['ENCOUNTER_ID'].nunique(),
+    })
+
+    kpis = member_metrics.join(claims_metrics.rename_axis('YEAR'), how='outer').fillna(0)
+    count_columns = ['MEMBER_COUNT', 'MEMBER_MONTHS', 'FEMALE_COUNT', 'TOTAL_COUNT', 'TOTAL_ENCOUNTERS']
+    kpis[count_columns] = kpis[count_columns].astype('int64')
+    kpis.index = kpis.index.astype('int64')
+
+    return {
+        'kpis': kpis,
+        'by_year': kpis.to_dict('index'),
+        'race': get_population_by_year(member_months, 'RACE'),
+        'state': get_population_by_year(member_months, 'STATE'),
+    }
+
+@st.cache_resource
+def get_metrics_cube():
+    """Get the all-years KPI cube; the 'kpis' frame is indexed by year for year-over-year comparisons."""
+    member_months = get_member_months_partition().data
+    claims_rollup = {name: partition.data for name, partition in get_claims_rollup().items()}
+    with record_timing("metrics cube", "build"):
+        return build_metrics_cube(member_months, claims_rollup)
+
+def get_year_kpis(year):
+    """Look up the precomputed KPIs for a year, or an empty dict if the year has no data."""
+    try:
+        return get_metrics_cube()['by_year'].get(int(year), {})
+    except (TypeError, ValueError):
+        return {}
 
-@st.cache_data
 def get_member_count(selected_year):
     """Get the total number of outlier members for the selected year."""
-    df_by_year = outlier_member_months_data[outlier_member_months_data['YEAR'].eq(selected_year)]
-    member_count = 0
-    if not df_by_year.empty:
-        member_count = df_by_year['MEMBER_ID'].nunique()
-    return member_count
+    return get_year_kpis(selected_year).get('MEMBER_COUNT', 0)
 
-@st.cache_data
 def get_member_months_count(year):
     """Get the total number of outlier members for the selected year."""
-    mask = outlier_member_months_data['YEAR'].astype(str) == str(year)
-    member_months_count = 0
-    if not outlier_member_months_data[mask].empty:
-        member_months_count = outlier_member_months_data[mask][['MEMBER_ID', 'YEAR_MONTH']].drop_duplicates().shape[0]
-    return member_months_count
+    return get_year_kpis(year).get('MEMBER_MONTHS', 0)
 
-@st.cache_data
 def get_metrics_data_csv(selected_year):
     """Get the metrics data for the selected year."""
-    if selected_year:
-        member_months_by_year = outlier_member_months_data[outlier_member_months_data['YEAR'].eq(selected_year)]
-
-        mean_age = member_months_by_year['AGE'].mean()
-        female_count = member_months_by_year[member_months_by_year["SEX"] == 'female']['MEMBER_ID'].nunique()
-        
-        mask2 = outlier_claims_agg_data['INCR_YEAR'].astype(str) == str(selected_year)
-        total_count = outlier_claims_agg_data[mask2]['TOTAL_MEMBERS'].iloc[0]
-        total_paid_amount = outlier_claims_agg_data[mask2]['TOTAL_PAID'].iloc[0]
-        total_outlier_paid = outlier_claims_agg_data[mask2]['PAID_AMOUNT'].sum()
-        outlier_threshold = outlier_claims_agg_data[mask2]['OUTLIER_THRESHOLD'].iloc[0]
-        total_encounters = outlier_claims_agg_data[mask2]['ENCOUNTER_ID'].nunique()
-
-        return {
-            "TOTAL_COUNT": total_count,
-            "TOTAL_PAID_AMOUNT": total_paid_amount,
-            "TOTAL_ENCOUNTERS": total_encounters,
-            "TOTAL_OUTLIER_PAID": total_outlier_paid,
-            "OUTLIER_THRESHOLD": outlier_threshold,
-            "MEAN_AGE": mean_age, 
-            "FEMALE_COUNT": female_count
-            }
-    
+    kpis = get_year_kpis(selected_year) if selected_year else {}
     return {
-        "TOTAL_COUNT": 0, 
-        "TOTAL_PAID_AMOUNT": 0,
-        "TOTAL_ENCOUNTERS": 0,
-        "TOTAL_OUTLIER_PAID": 0,
-        "MEAN_AGE": 0, 
-        "OUTLIER_THRESHOLD": 0,
-        "FEMALE_COUNT": 0
+        "TOTAL_COUNT": kpis.get("TOTAL_COUNT", 0),
+        "TOTAL_PAID_AMOUNT": kpis.get("TOTAL_PAID_AMOUNT", 0),
+        "TOTAL_ENCOUNTERS": kpis.get("TOTAL_ENCOUNTERS", 0),
+        "TOTAL_OUTLIER_PAID": kpis.get("TOTAL_OUTLIER_PAID", 0),
+        "OUTLIER_THRESHOLD": kpis.get("OUTLIER_THRESHOLD", 0),
+        "MEAN_AGE": kpis.get("MEAN_AGE", 0),
+        "FEMALE_COUNT": kpis.get("FEMALE_COUNT", 0)
         }
 
-@st.cache_data
 def get_v24_risk_score_csv(selected_year):
     """Get HCC risk score detail for the selected year."""
-    df_by_year = outlier_member_months_data[outlier_member_months_data['YEAR'].eq(selected_year)]
-
-    if not df_by_year.empty:
-        v24_risk_mean = df_by_year['V24_RISK_SCORE'].mean()
-        v24_risk_median = df_by_year['V24_RISK_SCORE'].median()
-        v24_risk_min = df_by_year['V24_RISK_SCORE'].min()
-        v24_risk_max = df_by_year['V24_RISK_SCORE'].max()
-    else:
-        v24_risk_mean = v24_risk_median = v24_risk_min = v24_risk_max = 0.0
-
+    kpis = get_year_kpis(selected_year)
     return {
-        "V24_RISK_MEAN": v24_risk_mean,
-        "V24_RISK_MEDIAN": v24_risk_median,
-        "V24_RISK_MIN": v24_risk_min,
-        "V24_RISK_MAX": v24_risk_max
+        "V24_RISK_MEAN": kpis.get("V24_RISK_MEAN", 0.0),
+        "V24_RISK_MEDIAN": kpis.get("V24_RISK_MEDIAN", 0.0),
+        "V24_RISK_MIN": kpis.get("V24_RISK_MIN", 0.0),
+        "V24_RISK_MAX": kpis.get("V24_RISK_MAX", 0.0)
     }
 
-@st.cache_data
+def get_year_population(column, year):
+    """Look up the precomputed population breakdown by RACE or STATE for a year."""
+    try:
+        population = get_metrics_cube()[column.lower()].get(int(year))
+    except (TypeError, ValueError):
+        population = None
+    if population is None:
+        return pd.DataFrame(columns=[column, *population_columns])
+    return population.copy()
+
 def get_outlier_population_by_race_csv(selected_year):
     """Get the outlier population by Race for the selected year."""
-    df_by_year = outlier_member_months_data[outlier_member_months_data['YEAR'].eq(selected_year)]
-    filtered_data = df_by_year[(df_by_year["RACE"].notnull())]
-    if not filtered_data.empty:
-        population_by_race = filtered_data.groupby('RACE')['MEMBER_ID'].nunique().reset_index(name='MEMBER_COUNT')
-        total_members = population_by_race['MEMBER_COUNT'].sum()
-        population_by_race['PERCENTAGE'] = (population_by_race['MEMBER_COUNT'] / total_members * 100).round(2)
-        population_by_race = population_by_race.sort_values('PERCENTAGE')
-        
-    return population_by_race
-
-@st.cache_data
+    return get_year_population('RACE', selected_year)
+
 def get_outlier_population_by_state_csv(selected_year):
     """Get the outlier population by State for the selected year."""
-    df_by_year = outlier_member_months_data[outlier_member_months_data['YEAR'].eq(selected_year)]
-    filtered_data = df_by_year[(df_by_year["STATE"].notnull())]
-    if not filtered_data.empty:
-        population_by_state = filtered_data.groupby('STATE')['MEMBER_ID'].nunique().reset_index(name='MEMBER_COUNT')
-        total_members = population_by_state['MEMBER_COUNT'].sum()
-        population_by_state['PERCENTAGE'] = (population_by_state['MEMBER_COUNT'] / total_members * 100).round(2)
-        population_by_state = population_by_state.sort_values('PERCENTAGE')
-        
-    return population_by_state
+    return get_year_population('STATE', selected_year)
+
+# SUMMARIES #
+
+# build_summaries.py writes each page summary below, one small Parquet file per year, to summary_dir. With
+# OUTLIER_SUMMARIES=1 the encounter and diagnosis pages read only those files and never load the claims.
+summary_dir = Path(os.environ.get("OUTLIER_SUMMARY_DIR", "data/summaries"))
+use_summaries = env_flag("OUTLIER_SUMMARIES", default=False)
+
+# Summary name -> the page function that computes it from the sources.
+summary_functions = {}
+
+def get_summary_path(name, year):
+    """Get the file holding one year of a summary table."""
+    return summary_dir / name / f"{year}.parquet"
+
+def write_summary(name, year, data):
+    """Write one year of a summary table, replacing any earlier build of it."""
+    path = get_summary_path(name, year)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temp file first so a running app never reads a partial summary.
+    tmp_path = get_tmp_path(path)
+    try:
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return path
+
+def get_summary_mtime(name, year):
+    """Get the modified time of one year of a summary table, or None if it has not been built."""
+    try:
+        return get_summary_path(name, year).stat().st_mtime_ns
+    except OSError:
+        return None
+
+def get_summary_version():
+    """Get the modified time of every summary file, which changes whenever build_summaries.py rewrites one."""
+    return tuple(sorted((str(path), path.stat().st_mtime_ns) for path in summary_dir.glob("*/*.parquet")))
+
+# Summary tables kept in memory. Each rebuild adds new entries, so older builds are evicted first.
+summary_cache_entries = 200
+
+@cache_stats.instrument(st.cache_data(max_entries=summary_cache_entries))
+def load_summary(name, year, mtime_ns):
+    """Load one year of a summary table; the modified time keys the cache, so a rebuilt file is read again."""
+    if mtime_ns is None:
+        raise FileNotFoundError(
+            f"No {name} summary for {year} in {summary_dir}. Run `python build_summaries.py` first."
+        )
+    return pd.read_parquet(get_summary_path(name, year))
+
+def read_summary(name, year):
+    """Read one year of a summary table written by build_summaries.py."""
+    return load_summary(name, year, get_summary_mtime(name, year))
+
+def summarized(name):
+    """Serve a year-keyed page function from its summary table when OUTLIER_SUMMARIES is on."""
+    def decorator(func):
+        summary_functions[name] = func
+        @functools.wraps(func)
+        def wrapper(selected_year):
+            if use_summaries:
+                return read_summary(name, selected_year)
+            return func(selected_year)
+        wrapper.clear = func.clear
+        return wrapper
+    return decorator
 
 # OUTLIERS BY ENCOUNTER #
 
-@st.cache_data
+def get_source_version():
+    """Get the size and modified time of each source CSV, plus the dtype settings, to key persisted results."""
+    stats = []
+    for file in (agg_claim_path, outlier_member_path):
+        # Once a file is loaded, results reflect the rows read from it, even if the file has changed since.
+        state = source_states.get(file)
+        if state is not None:
+            stats.append((state["size"], state["mtime_ns"]))
+            continue
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return use_categoricals, use_compact_numbers, None
+        stats.append((stat.st_size, stat.st_mtime_ns))
+    return use_categoricals, use_compact_numbers, tuple(stats)
+
+def get_data_version():
+    """Get a key that changes whenever the page data can, for caching what pages build from it."""
+    # In summaries mode the pages read the summary files, so rebuilding them changes the data too.
+    return use_summaries, get_source_version(), get_summary_version() if use_summaries else None
+
+@cache_stats.instrument(st.cache_data)
 def get_encounter_count(selected_year):
     """Get the total number of encounters for the selected year."""
-    df_by_year = outlier_claims_agg_data[outlier_claims_agg_data['INCR_YEAR'].eq(selected_year)]
-    encounter_count = 0
-    if not df_by_year.empty:
-        encounter_count = df_by_year['ENCOUNTER_ID'].nunique()
-    return encounter_count
+    return get_year_rollup(selected_year)['encounters']['ENCOUNTER_ID'].nunique()
 
-@st.cache_data
+@summarized("encounter_group")
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist(version=get_source_version)
 def get_pmpm_and_encounters_by_group_csv(selected_year):
     """Get PMPM and ENCOUNTERS_PER_1000 and PAID_PER_ENCOUNTER by encounter group for the selected year."""
     member_months_count = get_member_months_count(selected_year)
     encounter_count = get_encounter_count(selected_year)
     
-    df_by_year = outlier_claims_agg_data[outlier_claims_agg_data['INCR_YEAR'].eq(selected_year)]
+    rollup = get_year_rollup(selected_year)
 
-    if member_months_count == 0 or df_by_year.empty:
+    if member_months_count == 0 or rollup['paid_by_type'].empty:
         return pd.DataFrame(columns=['ENCOUNTER_GROUP', 'PMPM', 'ENCOUNTERS_PER_1000', 'PAID_PER_ENCOUNTER'])
-    
-    df_by_year.loc[:, "ENCOUNTER_GROUP"] = df_by_year["ENCOUNTER_GROUP"].fillna('null')
-   
+
     combined_df = (
-        df_by_year
-        .groupby('ENCOUNTER_GROUP', as_index=False)
-        .agg(
-            PAID_AMOUNT=('PAID_AMOUNT', 'sum'),
-            ENCOUNTER_COUNT=('ENCOUNTER_ID', 'nunique')
-        )
+        summarize_encounters(rollup, ['ENCOUNTER_GROUP'])
         .assign(
             PMPM=lambda df: df['PAID_AMOUNT'] / member_months_count,
             ENCOUNTERS_PER_1000=lambda df: df['ENCOUNTER_COUNT'] * 12000.0 / member_months_count,
@@ -177,26 +717,21 @@ def get_pmpm_and_encounters_by_group_csv(selected_year):
 
     return result
 
-@st.cache_data
+@summarized("encounter_type")
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist(version=get_source_version)
 def get_pmpm_and_encounters_by_type_csv(selected_year):
     """Get PMPM and ENCOUNTERS_PER_1000 by encounter type for the selected year."""
     member_months_count = get_member_months_count(selected_year)
     encounter_count = get_encounter_count(selected_year)
 
-    df_by_year = outlier_claims_agg_data[outlier_claims_agg_data['INCR_YEAR'].eq(selected_year)]
+    rollup = get_year_rollup(selected_year)
 
-    if member_months_count == 0 or df_by_year.empty:
+    if member_months_count == 0 or rollup['paid_by_type'].empty:
         return pd.DataFrame(columns=['ENCOUNTER_GROUP', 'ENCOUNTER_TYPE', 'PAID_AMOUNT', 'PMPM', 'ENCOUNTERS_PER_1000', 'PAID_PER_ENCOUNTER'])
-    
-    df_by_year = df_by_year.fillna({'ENCOUNTER_GROUP': 'null', 'ENCOUNTER_TYPE': 'null'})
 
     combined_df = (
-        df_by_year
-        .groupby(['ENCOUNTER_GROUP', 'ENCOUNTER_TYPE'], as_index=False)
-        .agg(
-            PAID_AMOUNT=('PAID_AMOUNT', 'sum'),
-            ENCOUNTER_COUNT=('ENCOUNTER_ID', 'nunique')
-        )
+        summarize_encounters(rollup, ['ENCOUNTER_GROUP', 'ENCOUNTER_TYPE'])
         .assign(
             PMPM=lambda df: df['PAID_AMOUNT'] / member_months_count,
             ENCOUNTERS_PER_1000=lambda df: df['ENCOUNTER_COUNT'] * 12000.0 / member_months_count,
@@ -223,12 +758,14 @@ def get_pmpm_and_encounters_by_type_csv(selected_year):
 
 # OUTLIERS BY Diagnosis #
 
-@st.cache_data
+@summarized("diagnosis_category")
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist(version=get_source_version)
 def get_pmpm_by_diagnosis_category_csv(selected_year):
     """Get PMPM by diagnosis category for the selected year."""
 
     member_months_count = get_member_months_count(selected_year)
-    df_by_year = outlier_claims_agg_data[outlier_claims_agg_data["INCR_YEAR"].eq(selected_year)]
+    df_by_year = get_year_rollup(selected_year)["paid_by_dx_category"]
 
     if member_months_count == 0 or df_by_year.empty:
         return pd.DataFrame(
@@ -240,9 +777,8 @@ def get_pmpm_by_diagnosis_category_csv(selected_year):
             ]
         )
 
-    df_by_year.loc[:, "DX_CCSR_CATEGORY2"] = df_by_year["DX_CCSR_CATEGORY2"].fillna("null")
     pmpm_df = (
-        df_by_year.groupby("DX_CCSR_CATEGORY2", as_index=False)["PAID_AMOUNT"]
+        df_by_year.groupby("DX_CCSR_CATEGORY2", as_index=False, observed=True)["PAID_AMOUNT"]
         .sum()
         .assign(
             PMPM=lambda df: np.where(
@@ -263,11 +799,13 @@ def get_pmpm_by_diagnosis_category_csv(selected_year):
         ])
     return result
 
-@st.cache_data
+@summarized("diagnosis")
+@cache_stats.instrument(st.cache_data)
+@result_cache.persist(version=get_source_version)
 def get_pmpm_by_diagnosis_csv(selected_year):
     """Get PMPM by diagnosis for the selected year."""
     member_months_count = get_member_months_count(selected_year)
-    df_by_year = outlier_claims_agg_data[outlier_claims_agg_data["INCR_YEAR"].eq(selected_year)]
+    df_by_year = get_year_rollup(selected_year)["paid_by_dx"]
 
     if member_months_count == 0 or df_by_year.empty:
         return pd.DataFrame(
@@ -279,9 +817,8 @@ def get_pmpm_by_diagnosis_csv(selected_year):
             ]
         )
 
-    df_by_year.loc[:, "DX_DESCRIPTION"] = df_by_year["DX_DESCRIPTION"].fillna("null")
     pmpm_df = (
-        df_by_year.groupby("DX_DESCRIPTION", as_index=False)["PAID_AMOUNT"]
+        df_by_year.groupby("DX_DESCRIPTION", as_index=False, observed=True)["PAID_AMOUNT"]
         .sum()
         .assign(
             PMPM=lambda df: np.where(
@@ -301,3 +838,219 @@ def get_pmpm_by_diagnosis_csv(selected_year):
             ["DX_DESCRIPTION", "PMPM", "CUMULATIVE_PMPM", "PERCENT_OF_TOTAL_PMPM"]
         ])
     return result
+
+
+# SOURCE REFRESH #
+
+# Year-keyed st.cache_data functions, cleared one year at a time when that year's rows change.
+year_cached_functions = [
+    get_encounter_count,
+    get_pmpm_and_encounters_by_group_csv,
+    get_pmpm_and_encounters_by_type_csv,
+    get_pmpm_by_diagnosis_category_csv,
+    get_pmpm_by_diagnosis_csv,
+]
+
+# What each loaded CSV looked like when it was read, so appended rows can be picked up without a full reload.
+source_states = {}
+refresh_lock = threading.Lock()
+# Bumped whenever a refresh invalidates cached results, so background work can tell it overlapped one.
+refresh_state = {"generation": 0}
+fingerprint_bytes = 64 * 1024
+
+
+def get_fingerprint(file, end):
+    """Hash the block of bytes just before an offset; a match means the file was not rewritten up to there."""
+    start = max(0, end - fingerprint_bytes)
+    with open(file, "rb") as f:
+        f.seek(start)
+        block = f.read(end - start)
+    return hashlib.sha256(block).hexdigest(), block.endswith(b"\n")
+
+def track_source(file):
+    """Record a source file's size, mtime, tail fingerprint and header as it is loaded."""
+    try:
+        stat = os.stat(file)
+        with open(file, "rb") as f:
+            header = pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns.tolist()
+        fingerprint, _ = get_fingerprint(file, stat.st_size)
+    except (OSError, ValueError):
+        source_states.pop(file, None)
+        return
+    source_states[file] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "fingerprint": fingerprint,
+        "header": header,
+    }
+
+def read_appended_rows(file, columns):
+    """Read only the rows written after the tracked size, or None if the file changed in any other way."""
+    state = source_states[file]
+    stat = os.stat(file)
+    if (stat.st_size, stat.st_mtime_ns) == (state["size"], state["mtime_ns"]):
+        return pd.DataFrame(columns=columns)
+    if stat.st_size <= state["size"]:
+        return None
+    fingerprint, ends_with_newline = get_fingerprint(file, state["size"])
+    if fingerprint != state["fingerprint"] or not ends_with_newline:
+        return None
+
+    with open(file, "rb") as f:
+        f.seek(state["size"])
+        appended = f.read(stat.st_size - state["size"])
+    rows = pd.read_csv(io.BytesIO(appended), header=None, names=state["header"], usecols=columns)
+    state.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, fingerprint=get_fingerprint(file, stat.st_size)[0])
+    return rows
+
+def append_member_months(rows):
+    """Fold appended member months rows into their year partitions and return the years they touch."""
+    rows = ingest(rows)
+    years = {int(year) for year in rows["YEAR"].dropna().unique()}
+    partition = get_member_months_partition()
+    partition.replace_years(years, concat_frames([partition.get_many(years), rows]))
+    return years
+
+def append_claims(rows):
+    """Fold appended claim rows into the claims rollup and return the years they touch."""
+    if not use_streaming:
+        rows = ingest(rows)
+    years = {int(year) for year in rows["INCR_YEAR"].dropna().unique()}
+    partitions = get_claims_rollup()
+    existing = {name: partition.get_many(years) for name, partition in partitions.items()}
+    merged = merge_rollups([existing, fold_claims(rows)])
+    for name, partition in partitions.items():
+        partition.replace_years(years, merged[name])
+    return years
+
+def update_metrics_cube(years):
+    """Recompute the cube entries for the given years, keeping every other year's results."""
+    cube = get_metrics_cube()
+    member_months = get_member_months_partition().get_many(years)
+    claims_rollup = {name: partition.get_many(years) for name, partition in get_claims_rollup().items()}
+    changed = build_metrics_cube(member_months, claims_rollup)
+
+    kpis = pd.concat([cube['kpis'].drop(index=list(years), errors='ignore'), changed['kpis']]).sort_index()
+    cube['kpis'] = kpis
+    cube['by_year'] = kpis.to_dict('index')
+    for column in ('race', 'state'):
+        population = {year: frame for year, frame in cube[column].items() if year not in years}
+        population.update(changed[column])
+        cube[column] = population
+
+def reload_source(file):
+    """Drop everything derived from a source that was rewritten rather than appended to."""
+    source_states.pop(file, None)
+    if file == outlier_member_path:
+        get_member_months_partition.clear()
+    else:
+        get_claims_rollup.clear()
+    get_metrics_cube.clear()
+    for func in year_cached_functions:
+        func.clear()
+
+def refresh_sources():
+    """Pick up changes to the loaded CSVs, ingesting appended rows and invalidating only the years they touch."""
+    with refresh_lock:
+        for file, columns, append in [
+            (outlier_member_path, member_months_columns, append_member_months),
+            (agg_claim_path, claims_columns, append_claims),
+        ]:
+            if file not in source_states:
+                continue
+            try:
+                rows = read_appended_rows(file, columns)
+            except (OSError, ValueError):
+                rows = None
+            if rows is None:
+                logger.info("Reloading %s: file was rewritten", file)
+                reload_source(file)
+                refresh_state["generation"] += 1
+                continue
+            if rows.empty:
+                continue
+
+            with record_timing(Path(file).stem, "append"):
+                years = append(rows)
+                update_metrics_cube(years)
+                for func in year_cached_functions:
+                    for year in years:
+                        func.clear(year)
+                refresh_state["generation"] += 1
+            logger.info("Appended %d rows to %s; refreshed years %s", len(rows), file, sorted(years))
+
+
+# PREFETCH #
+
+# How many of the most recent years are warmed when the server starts, and how many warm-ups run at once.
+prewarm_year_count = int(os.environ.get("OUTLIER_PREWARM_YEARS", 2))
+prefetch_workers = int(os.environ.get("OUTLIER_PREFETCH_WORKERS", 2))
+
+# Everything the three outlier pages read for a year.
+page_functions = [
+    get_metrics_data_csv,
+    get_v24_risk_score_csv,
+    get_outlier_population_by_race_csv,
+    get_outlier_population_by_state_csv,
+    *year_cached_functions,
+]
+
+# (refresh generation, year) pairs already submitted, so each year is warmed once per version of the data.
+prefetched = set()
+prefetch_lock = threading.Lock()
+
+
+@st.cache_resource
+def get_prefetch_pool():
+    """Create the worker pool shared by every session for background warm-ups."""
+    # Warm-ups run outside any session, so Streamlit's missing ScriptRunContext warning is expected there.
+    get_logger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: not record.threadName.startswith("outlier-prefetch")
+    )
+    return ThreadPoolExecutor(max_workers=max(1, prefetch_workers), thread_name_prefix="outlier-prefetch")
+
+def get_warm_functions():
+    """Get the year-keyed functions a warm-up calls. In summaries mode only the summaries are read, never the claims."""
+    if use_summaries:
+        return [functools.partial(read_summary, name) for name in summary_functions]
+    return page_functions
+
+def warm_year(year, generation):
+    """Compute every page's cached results for a year on a background thread."""
+    try:
+        with record_timing(f"prefetch {year}", "warm"):
+            for func in get_warm_functions():
+                func(year)
+    except Exception:
+        logger.exception("Prefetch failed for %s", year)
+        with prefetch_lock:
+            prefetched.discard((generation, year))
+        return
+    if refresh_state["generation"] != generation:
+        # A refresh ran while this year was being computed, so some results may have come from the old rows.
+        for func in year_cached_functions:
+            func.clear(year)
+
+def prefetch(years):
+    """Queue background warm-ups for the years not already warmed, without waiting for them."""
+    generation = refresh_state["generation"]
+    with prefetch_lock:
+        pending = [year for year in years if (generation, year) not in prefetched]
+        prefetched.update((generation, year) for year in pending)
+    pool = get_prefetch_pool()
+    for year in pending:
+        pool.submit(warm_year, year, generation)
+
+@st.cache_resource
+def start_prewarm():
+    """Warm the most recent years once per server process."""
+    prefetch(get_year_list()[:prewarm_year_count])
+    return True
+
+def prefetch_around(year):
+    """Warm every page for the selected year and the years on either side of it."""
+    years = get_year_list()
+    if year not in years:
+        return
+    index = years.index(year)
+    prefetch(years[max(0, index - 1):index + 2])
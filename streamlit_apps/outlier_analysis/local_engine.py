@@ -0,0 +1,95 @@
+import os
+import threading
+
+import duckdb
+import streamlit as st
+from csv_data import get_sidecar_path
+
+# Local files registered as the tables snowflake_data.py reads. A file is read through a view over its Parquet
+# sidecar when csv_data.py has written one for the current file. Otherwise the CSV is loaded into a DuckDB table:
+# views straight over read_csv_auto re-parse the file on every query, and can stall DuckDB on statements that
+# scan both files, like the cost driver query.
+source_tables = {
+    "OUTLIER_MEMBER_MONTHS": "data/outlier_member_months.csv",
+    "OUTLIER_CLAIMS_AGG": "data/outlier_claims_agg.csv",
+}
+
+# OUTLIER_MEMBERS is built from ALL_CLAIMS_AGG in Snowflake, which is not exported. Its per-year totals are
+# carried on every OUTLIER_CLAIMS_AGG row, and the mean paid per member is the total paid over the member count.
+outlier_members_view = """
+    CREATE OR REPLACE VIEW OUTLIER_MEMBERS AS
+    SELECT DISTINCT
+        INCR_YEAR
+        , TOTAL_PAID
+        , TOTAL_MEMBERS
+        , TOTAL_PAID / NULLIF(TOTAL_MEMBERS, 0) AS MEAN_PAID
+        , OUTLIER_THRESHOLD
+    FROM OUTLIER_CLAIMS_AGG
+"""
+
+# Tables each local file stands in for when snowflake_data.py keys its caches by table version.
+version_sources = {
+    "OUTLIER_MEMBER_MONTHS": "OUTLIER_MEMBER_MONTHS",
+    "OUTLIER_CLAIMS_AGG": "OUTLIER_CLAIMS_AGG",
+    "ALL_CLAIMS_AGG": "OUTLIER_CLAIMS_AGG",
+}
+
+
+class LocalConnection:
+    """Runs snowflake_data.py's SQL over the local CSVs in an embedded DuckDB database.
+
+    Only the query() interface of Streamlit's SnowflakeConnection is provided. CORE.MEMBER_MONTHS is not
+    exported with the CSVs, so get_total_members_count is not available locally.
+    """
+
+    def __init__(self):
+        self.db = duckdb.connect()
+        self.lock = threading.Lock()
+        self.sources = {}
+
+    def register_sources(self):
+        """Points each table at the current copy of its file, re-registering files that changed since the last query."""
+        with self.lock:
+            changed = False
+            for table, file in source_tables.items():
+                # The sidecar path is keyed by the CSV's size and mtime, so it changes whenever the CSV does.
+                sidecar = get_sidecar_path(file)
+                kind = "VIEW" if sidecar.exists() else "TABLE"
+                if self.sources.get(table) == (sidecar, kind):
+                    continue
+                if table in self.sources:
+                    self.db.execute(f"DROP {self.sources[table][1]} {table}")
+                if kind == "VIEW":
+                    self.db.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{sidecar.as_posix()}')")
+                else:
+                    self.db.execute(f"CREATE TABLE {table} AS SELECT * FROM read_csv_auto('{file}')")
+                self.sources[table] = (sidecar, kind)
+                changed = True
+            if changed:
+                self.db.execute(outlier_members_view)
+
+    def query(self, sql, params=None, ttl=None, **kwargs):
+        """Runs sql with qmark params and returns the result as a DataFrame with upper-case column names.
+
+        Like Snowflake, unquoted names come back in upper case. ttl is accepted for compatibility and ignored;
+        results are cached by the callers in snowflake_data.py.
+        """
+        self.register_sources()
+        # Each call gets its own cursor so the page query thread pool can run statements side by side.
+        result = self.db.cursor().execute(sql, params).df()
+        result.columns = [column.upper() for column in result.columns]
+        return result
+
+    def get_table_versions(self):
+        """Returns the version of every table backed by a local file, taken from the file's size and mtime."""
+        versions = {}
+        for table, source in version_sources.items():
+            stat = os.stat(source_tables[source])
+            versions[table] = f"{stat.st_size}-{stat.st_mtime_ns}"
+        return versions
+
+
+@st.cache_resource
+def get_local_connection():
+    """Get the embedded DuckDB connection shared by every session."""
+    return LocalConnection()
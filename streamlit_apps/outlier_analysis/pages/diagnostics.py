@@ -0,0 +1,10 @@
+import sys
+from pathlib import Path
+
+# Add the repo root (analytics/) to sys.path so we can import shared modules
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+
+from shared.utils.diagnostics import render_diagnostics
+
+# Not linked from the sidebar; open it at /diagnostics.
+render_diagnostics()
@@ -4,6 +4,7 @@ import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from csv_data import (
+    get_data_version,
     get_pmpm_by_diagnosis_category_csv,
     get_pmpm_by_diagnosis_csv
 )
@@ -14,22 +15,27 @@ from csv_data import (
 sys.path.append(str(Path(__file__).resolve().parents[3]))
 
 from shared import path_utils
+from shared.utils import cache_stats
 path_utils.add_repo_to_path(levels_up=3)
 
 year = st.session_state.get("selected_year") if "selected_year" in st.session_state else None
 
 # Add slider to select the number of diagnoses to show
 top_n = st.sidebar.slider("Number of Diagnoses to Show", 10, 500, 100, step=1) 
+# Bars drawn per window when paging through diagnoses.
+bars_per_window = 25
+# Only one window of bars is drawn at a time, so the chart size and payload do not grow with top_n.
+windowed = st.sidebar.toggle(
+    "Page Through Diagnoses",
+    value=True,
+    help=f"Draw {bars_per_window} bars at a time and pick the range to show above each chart. Turn off to draw every bar at once.",
+)
 
+# Built figures kept per chart, across every session. Each is keyed by year, top_n, window and data version.
+figure_cache_entries = 64
 
-# Use of local CSV files instead of Snowflake queries
-
-diagnosis_category_data = get_pmpm_by_diagnosis_category_csv(year)
-diagnosis_category_data = diagnosis_category_data.sort_values(by="PERCENT_OF_TOTAL_PMPM", ascending=False).head(top_n)
-
-diagnosis_data = get_pmpm_by_diagnosis_csv(year)
-diagnosis_data = diagnosis_data.sort_values(by="PERCENT_OF_TOTAL_PMPM", ascending=False).head(top_n)
 
+# Use of local CSV files instead of Snowflake queries, in the figure builders below
 
 # diagnosis_category_data = get_pmpm_by_diagnosis_category_csv(year)
 # diagnosis_data = get_pmpm_by_diagnosis_csv(year)
@@ -37,11 +43,9 @@ diagnosis_data = diagnosis_data.sort_values(by="PERCENT_OF_TOTAL_PMPM", ascendin
 def truncate_label(label, max_length=30):
     return str(label) if len(str(label)) <= max_length else str(label)[:max_length] + "..."
 
-truncated_category_labels = [truncate_label(label, 40) for label in diagnosis_category_data["DX_CCSR_CATEGORY2"]]
-full_category_labels = diagnosis_category_data["DX_CCSR_CATEGORY2"].tolist()
-
-truncated_labels = [truncate_label(label, 40) for label in diagnosis_data["DX_DESCRIPTION"]]
-full_labels = diagnosis_data["DX_DESCRIPTION"].tolist()
+def get_x_range(values):
+    # Leaves room for the text outside the longest bar.
+    return [min(values.min(), 0), values.max() * 1.15]
 
 st.markdown(
     """
@@ -59,148 +63,207 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-diagnosis_category_fig = make_subplots(
-    rows=1, cols=2,
-    column_widths=[0.5, 0.5],
-    shared_yaxes=True,
-    horizontal_spacing=0.05,
-    subplot_titles=("% of Paid PMPM", "Cumulative Paid PMPM")
-)
-
-# Bar 1: % of Paid PMPM
-diagnosis_category_fig.add_trace(
-    go.Bar(
-        x=diagnosis_category_data["PERCENT_OF_TOTAL_PMPM"],
-        y=diagnosis_category_data["DX_CCSR_CATEGORY2"],
-        text=[f"{x:.1f} %" for x in diagnosis_category_data["PERCENT_OF_TOTAL_PMPM"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        customdata=diagnosis_category_data["DX_CCSR_CATEGORY2"],
-        hovertemplate="<b>%{customdata}</b><br>PMPM: %{x:.1f}%<extra></extra>",
-    ),
-    row=1, col=1
-)
-
-# Bar 2: Cumulative Paid PMPM
-diagnosis_category_fig.add_trace(
-    go.Bar(
-        x=diagnosis_category_data["CUMULATIVE_PMPM"],
-        y=diagnosis_category_data["DX_CCSR_CATEGORY2"],
-        text=[f"${int(round(x)):,}" for x in diagnosis_category_data["CUMULATIVE_PMPM"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        customdata=diagnosis_category_data["DX_CCSR_CATEGORY2"],
-        hovertemplate="<b>%{customdata}</b><br>Cumulative PMPM: $%{x:,.0f}<extra></extra>",
-    ),
-    row=1, col=2
-)
-
-category_count = len(full_category_labels)
-category_height = min(max(30 * category_count, 400), 2000)
-
-diagnosis_category_fig.update_layout(
-    height=category_height,
-    width=1200,
-    margin=dict(l=150, b=10, t=45, r=55),
-    xaxis=dict(
-        showticklabels=False,
-    ),
-    yaxis=dict(
-        tickmode="array",
-        tickvals=full_category_labels,
-        ticktext=truncated_category_labels,
-        tickfont=dict(size=11)
-    ),
-    yaxis2=dict(
-        tickmode="array",
-        tickvals=full_category_labels,
-        ticktext=truncated_category_labels,
-        tickfont=dict(size=11)
-    ),
-    hovermode='y',
-)
-
-#make it so highest percent paid pmpm category is at the top
-diagnosis_category_fig.update_yaxes(autorange="reversed")
-
+# The figures only change with the year, top_n, window and data, so a rerun for the same inputs reuses the built figure
+# instead of fetching, sorting, formatting and laying out every bar again. Figures are shared read-only.
+@cache_stats.instrument(st.cache_resource(show_spinner=False, max_entries=figure_cache_entries))
+def build_diagnosis_category_figure(year, top_n, data_version, start=0, stop=None):
+    diagnosis_category_data = get_pmpm_by_diagnosis_category_csv(year)
+    diagnosis_category_data = diagnosis_category_data.sort_values(by="PERCENT_OF_TOTAL_PMPM", ascending=False).head(top_n)
+    top_category_data = diagnosis_category_data
+    diagnosis_category_data = diagnosis_category_data.iloc[start:stop]
+
+    truncated_category_labels = [truncate_label(label, 40) for label in diagnosis_category_data["DX_CCSR_CATEGORY2"]]
+    full_category_labels = diagnosis_category_data["DX_CCSR_CATEGORY2"].tolist()
+
+    diagnosis_category_fig = make_subplots(
+        rows=1, cols=2,
+        column_widths=[0.5, 0.5],
+        shared_yaxes=True,
+        horizontal_spacing=0.05,
+        subplot_titles=("% of Paid PMPM", "Cumulative Paid PMPM")
+    )
+
+    # Bar 1: % of Paid PMPM
+    diagnosis_category_fig.add_trace(
+        go.Bar(
+            x=diagnosis_category_data["PERCENT_OF_TOTAL_PMPM"],
+            y=diagnosis_category_data["DX_CCSR_CATEGORY2"],
+            text=[f"{x:.1f} %" for x in diagnosis_category_data["PERCENT_OF_TOTAL_PMPM"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            customdata=diagnosis_category_data["DX_CCSR_CATEGORY2"],
+            hovertemplate="<b>%{customdata}</b><br>PMPM: %{x:.1f}%<extra></extra>",
+        ),
+        row=1, col=1
+    )
+
+    # Bar 2: Cumulative Paid PMPM
+    diagnosis_category_fig.add_trace(
+        go.Bar(
+            x=diagnosis_category_data["CUMULATIVE_PMPM"],
+            y=diagnosis_category_data["DX_CCSR_CATEGORY2"],
+            text=[f"${int(round(x)):,}" for x in diagnosis_category_data["CUMULATIVE_PMPM"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            customdata=diagnosis_category_data["DX_CCSR_CATEGORY2"],
+            hovertemplate="<b>%{customdata}</b><br>Cumulative PMPM: $%{x:,.0f}<extra></extra>",
+        ),
+        row=1, col=2
+    )
+
+    category_count = len(full_category_labels)
+    category_height = min(max(30 * category_count, 400), 2000)
+
+    diagnosis_category_fig.update_layout(
+        height=category_height,
+        width=1200,
+        margin=dict(l=150, b=10, t=45, r=55),
+        xaxis=dict(
+            showticklabels=False,
+        ),
+        yaxis=dict(
+            tickmode="array",
+            tickvals=full_category_labels,
+            ticktext=truncated_category_labels,
+            tickfont=dict(size=11)
+        ),
+        yaxis2=dict(
+            tickmode="array",
+            tickvals=full_category_labels,
+            ticktext=truncated_category_labels,
+            tickfont=dict(size=11)
+        ),
+        hovermode='y',
+    )
+
+    #make it so highest percent paid pmpm category is at the top
+    diagnosis_category_fig.update_yaxes(autorange="reversed")
+
+    # A window keeps the x axes of all top_n bars, so bar lengths compare across windows.
+    if len(diagnosis_category_data) < len(top_category_data):
+        diagnosis_category_fig.update_xaxes(range=get_x_range(top_category_data["PERCENT_OF_TOTAL_PMPM"]), row=1, col=1)
+        diagnosis_category_fig.update_xaxes(range=get_x_range(top_category_data["CUMULATIVE_PMPM"]), row=1, col=2)
+
+    return diagnosis_category_fig
+
+@cache_stats.instrument(st.cache_resource(show_spinner=False, max_entries=figure_cache_entries))
+def build_diagnosis_figure(year, top_n, data_version, start=0, stop=None):
+    diagnosis_data = get_pmpm_by_diagnosis_csv(year)
+    diagnosis_data = diagnosis_data.sort_values(by="PERCENT_OF_TOTAL_PMPM", ascending=False).head(top_n)
+    top_diagnosis_data = diagnosis_data
+    diagnosis_data = diagnosis_data.iloc[start:stop]
+
+    truncated_labels = [truncate_label(label, 40) for label in diagnosis_data["DX_DESCRIPTION"]]
+    full_labels = diagnosis_data["DX_DESCRIPTION"].tolist()
+
+    diagnosis_fig = make_subplots(
+        rows=1, cols=2,
+        column_widths=[0.5, 0.5],
+        shared_yaxes=True,
+        horizontal_spacing=0.05,
+        subplot_titles=("% of Paid PMPM", "Cumulative Paid PMPM")
+    )
+
+    # Bar 1: % of Paid PMPM
+    diagnosis_fig.add_trace(
+        go.Bar(
+            x=diagnosis_data["PERCENT_OF_TOTAL_PMPM"],
+            y=diagnosis_data["DX_DESCRIPTION"],
+            text=[f"{x:.1f}" for x in diagnosis_data["PERCENT_OF_TOTAL_PMPM"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            customdata=diagnosis_data["DX_DESCRIPTION"],
+            hovertemplate="<b>%{customdata}</b><br>PMPM: %{x:.1f}%<extra></extra>",
+        ),
+        row=1, col=1
+    )
+
+    # Bar 2: Cumulative Paid PMPM
+    diagnosis_fig.add_trace(
+        go.Bar(
+            x=diagnosis_data["CUMULATIVE_PMPM"],
+            y=diagnosis_data["DX_DESCRIPTION"],
+            text=[f"${int(round(x)):,}" for x in diagnosis_data["CUMULATIVE_PMPM"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            customdata=diagnosis_data["DX_DESCRIPTION"],
+            hovertemplate="<b>%{customdata}</b><br>Cumulative PMPM: $%{x:,.0f}<extra></extra>",
+        ),
+        row=1, col=2
+    )
+
+    diagnosis_count = len(full_labels)
+    diagnosis_height = min(max(30 * diagnosis_count, 400), 3000)
+
+    diagnosis_fig.update_layout(
+        height=diagnosis_height,
+        width=1200,
+        margin=dict(l=150, b=10, t=45, r=55),
+        xaxis=dict(
+            showticklabels=False,
+        ),
+        yaxis=dict(
+            tickmode="array",
+            tickvals=full_labels,
+            ticktext=truncated_labels,
+            tickfont=dict(size=11)
+        ),
+        yaxis2=dict(
+            tickmode="array",
+            tickvals=full_labels,
+            ticktext=truncated_labels,
+            tickfont=dict(size=11)
+        ),
+        hovermode='y',
+    )
+    diagnosis_fig.update_yaxes(autorange="reversed")
+
+    # A window keeps the x axes of all top_n bars, so bar lengths compare across windows.
+    if len(diagnosis_data) < len(top_diagnosis_data):
+        diagnosis_fig.update_xaxes(range=get_x_range(top_diagnosis_data["PERCENT_OF_TOTAL_PMPM"]), row=1, col=1)
+        diagnosis_fig.update_xaxes(range=get_x_range(top_diagnosis_data["CUMULATIVE_PMPM"]), row=1, col=2)
+
+    return diagnosis_fig
+
+# The window picker needs each chart's bar count, which is cached with the same key as the figures so a rerun
+# does not fetch the frames again just to count them.
+@cache_stats.instrument(st.cache_resource(show_spinner=False, max_entries=figure_cache_entries))
+def get_bar_counts(year, data_version):
+    return {
+        "diagnosis-category-chart": len(get_pmpm_by_diagnosis_category_csv(year)),
+        "diagnosis-chart": len(get_pmpm_by_diagnosis_csv(year)),
+    }
+
+def select_window(bar_count, key):
+    """Draw a picker for which window of bars to show and return the window's start and stop."""
+    if not windowed or bar_count <= bars_per_window:
+        return 0, None
+    starts = range(0, bar_count, bars_per_window)
+    options = [f"{start + 1}-{min(start + bars_per_window, bar_count)}" for start in starts]
+    # The bar count is part of the key, so a new year or top_n starts again from the first window.
+    choice = st.select_slider("Ranks Shown", options=options, key=f"{key}-{bar_count}")
+    start = starts[options.index(choice)]
+    return start, start + bars_per_window
+
+# Each chart is a fragment, so moving through its windows reruns only that chart.
+@st.fragment
+def show_chart(build_figure, key):
+    data_version = get_data_version()
+    bar_count = get_bar_counts(year, data_version)[key]
+    start, stop = select_window(min(top_n, bar_count), f"{key}-window")
+    fig = build_figure(year, top_n, data_version, start, stop)
+    st.plotly_chart(fig, use_container_width=True, key=key)
 
 st.markdown("<h5 style='text-align: center; font-weight: bold;'>Diagnosis Category</h3>", unsafe_allow_html=True)
-st.plotly_chart(diagnosis_category_fig, use_container_width=True, key="diagnosis-category-chart")
-
-
-
-diagnosis_fig = make_subplots(
-    rows=1, cols=2,
-    column_widths=[0.5, 0.5],
-    shared_yaxes=True,
-    horizontal_spacing=0.05,
-    subplot_titles=("% of Paid PMPM", "Cumulative Paid PMPM")
-)
-
-# Bar 1: % of Paid PMPM
-diagnosis_fig.add_trace(
-    go.Bar(
-        x=diagnosis_data["PERCENT_OF_TOTAL_PMPM"],
-        y=diagnosis_data["DX_DESCRIPTION"],
-        text=[f"{x:.1f}" for x in diagnosis_data["PERCENT_OF_TOTAL_PMPM"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        customdata=diagnosis_data["DX_DESCRIPTION"],
-        hovertemplate="<b>%{customdata}</b><br>PMPM: %{x:.1f}%<extra></extra>",
-    ),
-    row=1, col=1
-)
-
-# Bar 2: Cumulative Paid PMPM
-diagnosis_fig.add_trace(
-    go.Bar(
-        x=diagnosis_data["CUMULATIVE_PMPM"],
-        y=diagnosis_data["DX_DESCRIPTION"],
-        text=[f"${int(round(x)):,}" for x in diagnosis_data["CUMULATIVE_PMPM"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        customdata=diagnosis_data["DX_DESCRIPTION"],
-        hovertemplate="<b>%{customdata}</b><br>Cumulative PMPM: $%{x:,.0f}<extra></extra>",
-    ),
-    row=1, col=2
-)
-
-diagnosis_count = len(full_labels)
-diagnosis_height = min(max(30 * diagnosis_count, 400), 3000)
-
-diagnosis_fig.update_layout(
-    height=diagnosis_height,
-    width=1200,
-    margin=dict(l=150, b=10, t=45, r=55),
-    xaxis=dict(
-        showticklabels=False,
-    ),
-    yaxis=dict(
-        tickmode="array",
-        tickvals=full_labels,
-        ticktext=truncated_labels,
-        tickfont=dict(size=11)
-    ),
-    yaxis2=dict(
-        tickmode="array",
-        tickvals=full_labels,
-        ticktext=truncated_labels,
-        tickfont=dict(size=11)
-    ),
-    hovermode='y',
-)
-diagnosis_fig.update_yaxes(autorange="reversed")
-
+show_chart(build_diagnosis_category_figure, "diagnosis-category-chart")
 
 st.markdown("<h5 style='text-align: center; font-weight: bold;'>Diagnosis</h3>", unsafe_allow_html=True)
-st.plotly_chart(diagnosis_fig, use_container_width=True, key="diagnosis-chart")
-
-
+show_chart(build_diagnosis_figure, "diagnosis-chart")
\ No newline at end of file
@@ -4,6 +4,7 @@ import streamlit as st
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from csv_data import (
+    get_data_version,
     get_pmpm_and_encounters_by_group_csv,
     get_pmpm_and_encounters_by_type_csv
     )
@@ -12,15 +13,13 @@ from csv_data import (
 sys.path.append(str(Path(__file__).resolve().parents[3]))
 
 from shared import path_utils
+from shared.utils import cache_stats
 path_utils.add_repo_to_path(levels_up=3)
 
 year = st.session_state.get("selected_year") if "selected_year" in st.session_state else None
 
-
-outlier_encounter_group_data = get_pmpm_and_encounters_by_group_csv(year)
-outlier_encouter_type_data = get_pmpm_and_encounters_by_type_csv(year)
-
-encounter_groups = outlier_encounter_group_data["ENCOUNTER_GROUP"].unique()
+# Built figures kept per chart, across every session. Each is keyed by year and data version.
+figure_cache_entries = 16
 
 color_map = {
     "null": "#D3D3D3",
@@ -34,193 +33,210 @@ color_map = {
 def get_colors_for_df(df):
     return [color_map[etype] for etype in df['ENCOUNTER_GROUP']]
 
-encounter_group_fig = make_subplots(
-    rows=1, cols=3,
-    shared_yaxes=True,
-    horizontal_spacing=0.1,
-    subplot_titles=("Paid PMPM", "Encounters per 1000", "Paid Per Encounter")
-)
-
-# Bar 1: PMPM
-encounter_group_fig.add_trace(
-    go.Bar(
-        x=outlier_encounter_group_data["PMPM"],
-        y=outlier_encounter_group_data["ENCOUNTER_GROUP"],
-        marker_color=get_colors_for_df(outlier_encounter_group_data),
-        text=[f"${int(round(x)):,}" for x in outlier_encounter_group_data["PMPM"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        hovertemplate=(
-            "<b>Encounter Group:</b> %{customdata[0]}<br>" +
-            "<b>Paid PMPM:</b> $%{x:,.0f}<extra></extra>"
+# The figures only change with the year and data, so a rerun for the same inputs reuses the built figure instead
+# of formatting and laying out every bar again. Figures are shared read-only.
+@cache_stats.instrument(st.cache_resource(show_spinner=False, max_entries=figure_cache_entries))
+def build_encounter_group_figure(year, data_version):
+    outlier_encounter_group_data = get_pmpm_and_encounters_by_group_csv(year)
+
+    encounter_group_fig = make_subplots(
+        rows=1, cols=3,
+        shared_yaxes=True,
+        horizontal_spacing=0.1,
+        subplot_titles=("Paid PMPM", "Encounters per 1000", "Paid Per Encounter")
+    )
+
+    # Bar 1: PMPM
+    encounter_group_fig.add_trace(
+        go.Bar(
+            x=outlier_encounter_group_data["PMPM"],
+            y=outlier_encounter_group_data["ENCOUNTER_GROUP"],
+            marker_color=get_colors_for_df(outlier_encounter_group_data),
+            text=[f"${int(round(x)):,}" for x in outlier_encounter_group_data["PMPM"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            hovertemplate=(
+                "<b>Encounter Group:</b> %{customdata[0]}<br>" +
+                "<b>Paid PMPM:</b> $%{x:,.0f}<extra></extra>"
+            ),
+            customdata=outlier_encounter_group_data[["ENCOUNTER_GROUP"]].values
         ),
-        customdata=outlier_encounter_group_data[["ENCOUNTER_GROUP"]].values
-    ),
-    row=1, col=1
-)
-
-# Bar 2: Encounters per 1000
-encounter_group_fig.add_trace(
-    go.Bar(
-        x=outlier_encounter_group_data["ENCOUNTERS_PER_1000"],
-        y=outlier_encounter_group_data["ENCOUNTER_GROUP"],
-        marker_color=get_colors_for_df(outlier_encounter_group_data),
-        text=[f"{int(round(x)):,}" for x in outlier_encounter_group_data["ENCOUNTERS_PER_1000"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        hovertemplate=(
-            "<b>Encounter Group:</b> %{customdata[0]}<br>" +
-            "<b>Encounters Per 1000:</b> %{x:,.0f}<extra></extra>"
+        row=1, col=1
+    )
+
+    # Bar 2: Encounters per 1000
+    encounter_group_fig.add_trace(
+        go.Bar(
+            x=outlier_encounter_group_data["ENCOUNTERS_PER_1000"],
+            y=outlier_encounter_group_data["ENCOUNTER_GROUP"],
+            marker_color=get_colors_for_df(outlier_encounter_group_data),
+            text=[f"{int(round(x)):,}" for x in outlier_encounter_group_data["ENCOUNTERS_PER_1000"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            hovertemplate=(
+                "<b>Encounter Group:</b> %{customdata[0]}<br>" +
+                "<b>Encounters Per 1000:</b> %{x:,.0f}<extra></extra>"
+            ),
+            customdata=outlier_encounter_group_data[["ENCOUNTER_GROUP"]].values
         ),
-        customdata=outlier_encounter_group_data[["ENCOUNTER_GROUP"]].values
-    ),
-    row=1, col=2
-)
-
-# Bar 3: Paid per Encounter
-encounter_group_fig.add_trace(
-    go.Bar(
-        x=outlier_encounter_group_data["PAID_PER_ENCOUNTER"],
-        y=outlier_encounter_group_data["ENCOUNTER_GROUP"],
-        marker_color=get_colors_for_df(outlier_encounter_group_data),
-        text=[f"${int(round(x)):,}" for x in outlier_encounter_group_data["PAID_PER_ENCOUNTER"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        hovertemplate=(
-            "<b>Encounter Group:</b> %{customdata[0]}<br>" +
-            "<b>Paid Per Encounter:</b> $%{x:,.0f}<extra></extra>"
+        row=1, col=2
+    )
+
+    # Bar 3: Paid per Encounter
+    encounter_group_fig.add_trace(
+        go.Bar(
+            x=outlier_encounter_group_data["PAID_PER_ENCOUNTER"],
+            y=outlier_encounter_group_data["ENCOUNTER_GROUP"],
+            marker_color=get_colors_for_df(outlier_encounter_group_data),
+            text=[f"${int(round(x)):,}" for x in outlier_encounter_group_data["PAID_PER_ENCOUNTER"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            hovertemplate=(
+                "<b>Encounter Group:</b> %{customdata[0]}<br>" +
+                "<b>Paid Per Encounter:</b> $%{x:,.0f}<extra></extra>"
+            ),
+            customdata=outlier_encounter_group_data[["ENCOUNTER_GROUP"]].values
         ),
-        customdata=outlier_encounter_group_data[["ENCOUNTER_GROUP"]].values
-    ),
-    row=1, col=3
-)
-
-encounter_group_fig.update_xaxes(showticklabels=False)
-
-encounter_group_fig.update_layout(
-    height=220,
-    width=1200,
-    margin=dict(l=150, b=10, r=65),
-    title=dict(
-        text="Encounter Group",
-        x=0.5,
-        xanchor='center',
-        font=dict(size=20)
+        row=1, col=3
     )
-)
 
-st.plotly_chart(encounter_group_fig, use_container_width=True)
+    encounter_group_fig.update_xaxes(showticklabels=False)
+
+    encounter_group_fig.update_layout(
+        height=220,
+        width=1200,
+        margin=dict(l=150, b=10, r=65),
+        title=dict(
+            text="Encounter Group",
+            x=0.5,
+            xanchor='center',
+            font=dict(size=20)
+        )
+    )
+
+    return encounter_group_fig
+
+@cache_stats.instrument(st.cache_resource(show_spinner=False, max_entries=figure_cache_entries))
+def build_encounter_type_figure(year, data_version):
+    outlier_encouter_type_data = get_pmpm_and_encounters_by_type_csv(year)
+
+    encounter_type_fig = make_subplots(
+        rows=1, cols=3,
+        shared_yaxes=True,
+        horizontal_spacing=0.1,
+        subplot_titles=("Paid PMPM", "Encounters per 1000", "Paid Per Encounter")
+    )
 
-encounter_type_fig = make_subplots(
-    rows=1, cols=3,
-    shared_yaxes=True,
-    horizontal_spacing=0.1,
-    subplot_titles=("Paid PMPM", "Encounters per 1000", "Paid Per Encounter")
-)
-
-# Bar 1: PMPM
-encounter_type_fig.add_trace(
-    go.Bar(
-        x=outlier_encouter_type_data["PMPM"],
-        y=outlier_encouter_type_data["ENCOUNTER_TYPE"],
-        marker_color=get_colors_for_df(outlier_encouter_type_data),
-        text=[f"${int(round(x)):,}" for x in outlier_encouter_type_data["PMPM"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        hovertemplate=(
-            "<b>Encounter Group:</b> %{customdata[0]}<br>" +
-            "<b>Encounter Type:</b> %{y}<br>" +
-            "<b>Paid PMPM:</b> $%{x:,.0f}<extra></extra>"
+    # Bar 1: PMPM
+    encounter_type_fig.add_trace(
+        go.Bar(
+            x=outlier_encouter_type_data["PMPM"],
+            y=outlier_encouter_type_data["ENCOUNTER_TYPE"],
+            marker_color=get_colors_for_df(outlier_encouter_type_data),
+            text=[f"${int(round(x)):,}" for x in outlier_encouter_type_data["PMPM"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            hovertemplate=(
+                "<b>Encounter Group:</b> %{customdata[0]}<br>" +
+                "<b>Encounter Type:</b> %{y}<br>" +
+                "<b>Paid PMPM:</b> $%{x:,.0f}<extra></extra>"
+            ),
+            customdata=outlier_encouter_type_data[["ENCOUNTER_GROUP"]].values
         ),
-        customdata=outlier_encouter_type_data[["ENCOUNTER_GROUP"]].values
-    ),
-    row=1, col=1
-)
-
-# Bar 2: Encounters per 1000
-encounter_type_fig.add_trace(
-    go.Bar(
-        x=outlier_encouter_type_data["ENCOUNTERS_PER_1000"],
-        y=outlier_encouter_type_data["ENCOUNTER_TYPE"],
-        marker_color=get_colors_for_df(outlier_encouter_type_data),
-        text=[f"{int(round(x)):,}" for x in outlier_encouter_type_data["ENCOUNTERS_PER_1000"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        hovertemplate=(
-            "<b>Encounter Group:</b> %{customdata[0]}<br>" +
-            "<b>Encounter Type:</b> %{y}<br>" +
-            "<b>Encounters Per 1000:</b> %{x:,.0f}<extra></extra>"
+        row=1, col=1
+    )
+
+    # Bar 2: Encounters per 1000
+    encounter_type_fig.add_trace(
+        go.Bar(
+            x=outlier_encouter_type_data["ENCOUNTERS_PER_1000"],
+            y=outlier_encouter_type_data["ENCOUNTER_TYPE"],
+            marker_color=get_colors_for_df(outlier_encouter_type_data),
+            text=[f"{int(round(x)):,}" for x in outlier_encouter_type_data["ENCOUNTERS_PER_1000"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            hovertemplate=(
+                "<b>Encounter Group:</b> %{customdata[0]}<br>" +
+                "<b>Encounter Type:</b> %{y}<br>" +
+                "<b>Encounters Per 1000:</b> %{x:,.0f}<extra></extra>"
+            ),
+            customdata=outlier_encouter_type_data[["ENCOUNTER_GROUP"]].values
+        ),
+        row=1, col=2
+    )
+
+    # Bar 3: Paid per Encounter
+    encounter_type_fig.add_trace(
+        go.Bar(
+            x=outlier_encouter_type_data["PAID_PER_ENCOUNTER"],
+            y=outlier_encouter_type_data["ENCOUNTER_TYPE"],
+            marker_color=get_colors_for_df(outlier_encouter_type_data),
+             text=[f"${int(round(x)):,}" for x in outlier_encouter_type_data["PAID_PER_ENCOUNTER"]],
+            textposition='outside',
+            cliponaxis=False,
+            orientation='h',
+            showlegend=False,
+            hovertemplate=(
+                "<b>Encounter Group:</b> %{customdata[0]}<br>" +
+                "<b>Encounter Type:</b> %{y}<br>" +
+                "<b>Paid Per Encounter:</b> $%{x:,.0f}<extra></extra>"
+            ),
+            customdata=outlier_encouter_type_data[["ENCOUNTER_GROUP"]].values
+        ),
+        row=1, col=3
+    )
+
+    encounter_type_labels = outlier_encouter_type_data["ENCOUNTER_TYPE"].tolist()
+
+    encounter_type_fig.update_xaxes(showticklabels=False)
+
+    encounter_type_fig.update_layout(
+        height=max(30 * len(encounter_type_labels), 500),
+        width=1200,
+        title=dict(
+            text="Encounter Type",
+            x=0.5,
+            xanchor='center',
+            font=dict(size=20)
+        ),
+        margin=dict(b=2, r=65),
+        yaxis=dict(
+            tickmode="array",
+            tickvals=encounter_type_labels,
+            ticktext=encounter_type_labels,
+            tickfont=dict(size=11)
         ),
-        customdata=outlier_encouter_type_data[["ENCOUNTER_GROUP"]].values
-    ),
-    row=1, col=2
-)
-
-# Bar 3: Paid per Encounter
-encounter_type_fig.add_trace(
-    go.Bar(
-        x=outlier_encouter_type_data["PAID_PER_ENCOUNTER"],
-        y=outlier_encouter_type_data["ENCOUNTER_TYPE"],
-        marker_color=get_colors_for_df(outlier_encouter_type_data),
-         text=[f"${int(round(x)):,}" for x in outlier_encouter_type_data["PAID_PER_ENCOUNTER"]],
-        textposition='outside',
-        cliponaxis=False,
-        orientation='h',
-        showlegend=False,
-        hovertemplate=(
-            "<b>Encounter Group:</b> %{customdata[0]}<br>" +
-            "<b>Encounter Type:</b> %{y}<br>" +
-            "<b>Paid Per Encounter:</b> $%{x:,.0f}<extra></extra>"
+        yaxis2=dict(
+            tickmode="array",
+            tickvals=encounter_type_labels,
+            ticktext=encounter_type_labels,
+            tickfont=dict(size=11)
         ),
-        customdata=outlier_encouter_type_data[["ENCOUNTER_GROUP"]].values
-    ),
-    row=1, col=3
-)
-
-encounter_type_labels = outlier_encouter_type_data["ENCOUNTER_TYPE"].tolist()
-
-encounter_type_fig.update_xaxes(showticklabels=False)
-
-encounter_type_fig.update_layout(
-    height=max(30 * len(encounter_type_labels), 500),
-    width=1200,
-    title=dict(
-        text="Encounter Type",
-        x=0.5,
-        xanchor='center',
-        font=dict(size=20)
-    ),
-    margin=dict(b=2, r=65),
-    yaxis=dict(
-        tickmode="array",
-        tickvals=encounter_type_labels,
-        ticktext=encounter_type_labels,
-        tickfont=dict(size=11)
-    ),
-    yaxis2=dict(
-        tickmode="array",
-        tickvals=encounter_type_labels,
-        ticktext=encounter_type_labels,
-        tickfont=dict(size=11)
-    ),
-    yaxis3=dict(
-        tickmode="array",
-        tickvals=encounter_type_labels,
-        ticktext=encounter_type_labels,
-        tickfont=dict(size=11)
+        yaxis3=dict(
+            tickmode="array",
+            tickvals=encounter_type_labels,
+            ticktext=encounter_type_labels,
+            tickfont=dict(size=11)
+        )
     )
-)
 
+    return encounter_type_fig
+
+data_version = get_data_version()
+encounter_group_fig = build_encounter_group_figure(year, data_version)
+encounter_type_fig = build_encounter_type_figure(year, data_version)
+
+st.plotly_chart(encounter_group_fig, use_container_width=True)
 
 st.plotly_chart(encounter_type_fig, use_container_width=True)
 
@@ -1,10 +1,92 @@
+import functools
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Add the repo root to sys.path so we can import shared modules
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from shared.utils import cache_stats, result_cache
+
+logger = get_logger(__name__)
+
+# DATA VERSIONS
+
+# Each cached function below is keyed by the LAST_ALTERED time of the tables it reads, so a table rebuild only
+# recomputes the entries that read that table. The times are probed at most once a minute.
+version_probe_seconds = 60
+
+# Tables whose LAST_ALTERED is probed. Unqualified names are looked up in the connection's current schema.
+# OUTLIER_MEMBERS is a view, and a view's LAST_ALTERED only changes with its DDL, so the ALL_CLAIMS_AGG table
+# it reads is probed in its place.
+versioned_tables = ["OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG", "ALL_CLAIMS_AGG", "CORE.MEMBER_MONTHS"]
+
+# Entries kept per versioned function. A rebuild adds new keys rather than replacing old ones, so the least
+# recently used entries, which include every superseded version, are evicted past a few per year.
+versioned_cache_entries = 50
+
+def run_query(_conn: str, sql: str, params=None):
+    # The connection's own query cache never expires, so it is skipped; the versioned caches decide freshness.
+    return _conn.query(sql, params=params, ttl=0)
+
+def get_table_versions(_conn: str):
+    # Connections are shared resources that live as long as the process, so their id tells them apart.
+    return probe_table_versions(_conn, f"{type(_conn).__name__}-{id(_conn)}")
+
+# The connection key is part of the cache key, so a LocalConnection and a Snowflake connection in the same
+# process never share versions.
+@cache_stats.instrument(st.cache_data(ttl=version_probe_seconds, show_spinner=False))
+def probe_table_versions(_conn: str, connection_key: str):
+    # Connections that are not backed by Snowflake, like local_engine.LocalConnection, report their own versions.
+    if hasattr(_conn, "get_table_versions"):
+        return _conn.get_table_versions()
+    predicates = []
+    params = []
+    for table in versioned_tables:
+        schema, _, name = table.rpartition(".")
+        predicates.append("(TABLE_SCHEMA = COALESCE(?, CURRENT_SCHEMA()) AND TABLE_NAME = ?)")
+        params += [schema or None, name]
+    try:
+        versions = run_query(_conn, f"""
+            SELECT
+                TABLE_SCHEMA = CURRENT_SCHEMA() AS IN_CURRENT_SCHEMA
+                , TABLE_SCHEMA
+                , TABLE_NAME
+                , LAST_ALTERED
+            FROM INFORMATION_SCHEMA.TABLES
+            WHERE {" OR ".join(predicates)}
+        """, params=params)
+    except Exception as e:
+        # Without versions every entry keeps its current key, which is how the caches behaved before probing.
+        logger.warning(f"Could not read table versions: {e}")
+        return {}
+    return {
+        row.TABLE_NAME if row.IN_CURRENT_SCHEMA else f"{row.TABLE_SCHEMA}.{row.TABLE_NAME}": str(row.LAST_ALTERED)
+        for row in versions.itertuples()
+    }
+
+# Passes the current versions of tables to the wrapped cached function as its data_version argument.
+def versioned(*tables):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(_conn, *args, **kwargs):
+            versions = get_table_versions(_conn)
+            return func(_conn, *args, data_version=tuple(versions.get(table) for table in tables), **kwargs)
+        wrapper.clear = func.clear
+        return wrapper
+    return decorator
 
 # App.py
 
-@st.cache_data
-def get_year_list(_conn: str):
-    return _conn.query("""
+@versioned("OUTLIER_MEMBER_MONTHS")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+def get_year_list(_conn: str, data_version=None):
+    return run_query(_conn, """
         SELECT DISTINCT YEAR
         FROM OUTLIER_MEMBER_MONTHS
         ORDER BY YEAR DESC;
@@ -12,148 +94,222 @@ def get_year_list(_conn: str):
 
 # OUTLIER COST DRIVER
 
-@st.cache_data
-def get_metrics_data(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            COUNT(DISTINCT OM.MEMBER_ID) AS MEMBER_MONTHS
-            , AVG(OM.AGE) AS MEAN_AGE
-            , COUNT(DISTINCT CASE WHEN OM.SEX = 'female' THEN OM.MEMBER_ID END) AS FEMALE_COUNT
-        FROM OUTLIER_MEMBER_MONTHS OM
-        WHERE OM.YEAR = {year};
-    """)
-
-@st.cache_data
-def get_outlier_claims_data(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            SUM(PAID_AMOUNT) AS TOTAL_PAID
-            , COUNT(DISTINCT ENCOUNTER_ID) AS TOTAL_ENCOUNTERS
+# Every query the cost driver page needs runs as one statement: the member months breakdowns come from a
+# single GROUPING SETS pass, and the claims totals and mean paid are appended as their own sections. The
+# result is split back into the shapes the per-metric functions below have always returned.
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG", "ALL_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+def get_cost_driver_data(_conn: str, year: str, data_version=None):
+    return split_cost_driver_data(query_cost_driver_data(_conn, year, data_version))
+
+@result_cache.persist()
+def query_cost_driver_data(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_months AS (
+            SELECT
+                MEMBER_ID
+                , AGE
+                , SEX
+                , RACE
+                , STATE
+                , V24_RISK_SCORE
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        ),
+        member_rollup AS (
+            SELECT
+                CASE
+                    WHEN GROUPING(RACE) = 0 THEN 'RACE'
+                    WHEN GROUPING(STATE) = 0 THEN 'STATE'
+                    WHEN GROUPING(MEMBER_ID) = 0 THEN 'RISK_SCORE'
+                    ELSE 'METRICS'
+                END AS SECTION
+                , COALESCE(RACE, STATE) AS LABEL
+                , MEMBER_ID
+                , V24_RISK_SCORE AS RISK_SCORE
+                , COUNT(DISTINCT MEMBER_ID) AS MEMBER_COUNT
+                , AVG(AGE) AS MEAN_AGE
+                , COUNT(DISTINCT CASE WHEN SEX = 'female' THEN MEMBER_ID END) AS FEMALE_COUNT
+                , AVG(V24_RISK_SCORE) AS AVG_RISK_SCORE
+            FROM member_months
+            GROUP BY GROUPING SETS ((), (RACE), (STATE), (MEMBER_ID, V24_RISK_SCORE))
+        ),
+        member_sections AS (
+            SELECT *
+            FROM member_rollup
+            WHERE SECTION = 'METRICS'
+                OR (SECTION IN ('RACE', 'STATE') AND LABEL IS NOT NULL)
+                OR (SECTION = 'RISK_SCORE' AND RISK_SCORE IS NOT NULL)
+        )
+
+        SELECT
+            SECTION
+            , LABEL
+            , MEMBER_ID
+            , RISK_SCORE
+            , MEMBER_COUNT
+            , ROUND(
+                MEMBER_COUNT * 100.0 /
+                SUM(MEMBER_COUNT) OVER (PARTITION BY SECTION), 2
+            ) AS PERCENTAGE
+            , MEAN_AGE
+            , FEMALE_COUNT
+            , AVG_RISK_SCORE
+            , NULL AS TOTAL_PAID
+            , NULL AS TOTAL_ENCOUNTERS
+            , NULL AS MEAN_PAID
+        FROM member_sections
+
+        UNION ALL
+
+        SELECT
+            'CLAIMS', NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+            , SUM(PAID_AMOUNT)
+            , COUNT(DISTINCT ENCOUNTER_ID)
+            , NULL
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR = {year};
-    """)
+        WHERE INCR_YEAR = ?
+
+        UNION ALL
 
+        SELECT
+            'MEAN_PAID', NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+            , (SELECT MEAN_PAID FROM OUTLIER_MEMBERS WHERE INCR_YEAR = ? LIMIT 1);
+    """, params=[year, year, year])
+
+def split_cost_driver_data(result):
+    sections = {name: rows for name, rows in result.groupby("SECTION")}
+
+    def section(name, columns):
+        rows = sections.get(name, result.iloc[0:0])
+        return rows[columns].reset_index(drop=True)
+
+    def population(name):
+        rows = section(name, ["LABEL", "MEMBER_COUNT", "PERCENTAGE"]).rename(columns={"LABEL": name})
+        return rows.sort_values("PERCENTAGE", kind="stable", ignore_index=True)
+
+    # GROUPING SETS emits no grand total row over an empty year, so fall back to a row of nulls.
+    metrics = section("METRICS", ["MEMBER_COUNT", "MEAN_AGE", "FEMALE_COUNT", "AVG_RISK_SCORE"]).reindex([0])
+    return {
+        "metrics": metrics.rename(columns={"MEMBER_COUNT": "MEMBER_MONTHS"})[["MEMBER_MONTHS", "MEAN_AGE", "FEMALE_COUNT"]],
+        "outlier_claims": section("CLAIMS", ["TOTAL_PAID", "TOTAL_ENCOUNTERS"]),
+        "mean_paid": section("MEAN_PAID", ["MEAN_PAID"]).reindex([0]).iloc[0],
+        "avg_hcc_risk_score": metrics[["AVG_RISK_SCORE"]].iloc[0],
+        "population_by_race": population("RACE"),
+        "population_by_state": population("STATE"),
+        "v24_risk_scores": section("RISK_SCORE", ["MEMBER_ID", "RISK_SCORE"]),
+    }
+
+def get_metrics_data(_conn: str, year: str):
+    return get_cost_driver_data(_conn, year)["metrics"]
+
+def get_outlier_claims_data(_conn: str, year: str):
+    return get_cost_driver_data(_conn, year)["outlier_claims"]
 
-@st.cache_data
 def get_mean_paid(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            mean_paid
-        FROM OUTLIER_MEMBERS
-        WHERE INCR_YEAR = {year}
-        LIMIT 1;
-    """).iloc[0]
+    return get_cost_driver_data(_conn, year)["mean_paid"]
 
-@st.cache_data
 def get_avg_hcc_risk_score(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            AVG(V24_RISK_SCORE) AS AVG_RISK_SCORE
-        FROM OUTLIER_MEMBER_MONTHS
-        WHERE YEAR = {year} AND V24_RISK_SCORE IS NOT NULL;;
-    """).iloc[0]
+    return get_cost_driver_data(_conn, year)["avg_hcc_risk_score"]
 
-@st.cache_data
 def get_outlier_population_by_race(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            RACE
-            , COUNT(DISTINCT MEMBER_ID) AS MEMBER_COUNT
-            , ROUND(
-                COUNT(DISTINCT MEMBER_ID) * 100.0 / 
-                SUM(COUNT(DISTINCT MEMBER_ID)) OVER (), 2
-            ) AS PERCENTAGE 
-        FROM OUTLIER_MEMBER_MONTHS WHERE YEAR = {year} AND RACE IS NOT NULL GROUP BY RACE
-        ORDER BY PERCENTAGE;
-    """)
-
-@st.cache_data
+    return get_cost_driver_data(_conn, year)["population_by_race"]
+
 def get_outlier_population_by_state(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            STATE
-            , COUNT(DISTINCT MEMBER_ID) AS MEMBER_COUNT
-            , ROUND(
-                COUNT(DISTINCT MEMBER_ID) * 100.0 / 
-                SUM(COUNT(DISTINCT MEMBER_ID)) OVER (), 2
-            ) AS PERCENTAGE 
-        FROM OUTLIER_MEMBER_MONTHS WHERE YEAR = {year} AND STATE IS NOT NULL GROUP BY STATE
-        ORDER BY PERCENTAGE;
-    """)
-
-@st.cache_data
+    return get_cost_driver_data(_conn, year)["population_by_state"]
+
 def get_v24_risk_scores(_conn: str, year: str):
-    return _conn.query(f"""
-        SELECT 
-            DISTINCT(MEMBER_ID)
-            , V24_RISK_SCORE AS RISK_SCORE
-        FROM OUTLIER_MEMBER_MONTHS
-        WHERE YEAR = {year} AND RISK_SCORE IS NOT NULL;
-    """)
+    return get_cost_driver_data(_conn, year)["v24_risk_scores"]
 
 
 # OUTLIERS BY ENCOUNTER
 
-@st.cache_data
-def get_total_members_count(_conn: str, year: str):
-    return _conn.query(f"SELECT COUNT(DISTINCT MEMBER_ID) as total FROM CORE.MEMBER_MONTHS WHERE YEAR_MONTH BETWEEN {year}01 AND {year}12").iloc[0]['TOTAL']
-
-@st.cache_data
-def get_outlier_members_count(_conn: str, year: str):
-    return _conn.query(f"SELECT COUNT(DISTINCT MEMBER_ID) as total FROM OUTLIER_MEMBER_MONTHS WHERE YEAR={year}").iloc[0]['TOTAL']
-
-@st.cache_data
-def get_encounter_count(_conn: str, year: str):
-    return _conn.query(f"SELECT COUNT(DISTINCT ENCOUNTER_ID) as total FROM OUTLIER_CLAIMS_AGG WHERE INCR_YEAR={year}").iloc[0]['TOTAL']
+# Years and counts are bound as qmark parameters rather than formatted into the SQL, so the query text stays
+# the same across years and Snowflake can reuse compiled plans and cached results. The member count each
+# rate is divided by is computed in the same statement instead of a separate query.
+
+@versioned("CORE.MEMBER_MONTHS")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+def get_total_members_count(_conn: str, year: str, data_version=None):
+    return run_query(
+        _conn,
+        "SELECT COUNT(DISTINCT MEMBER_ID) as total FROM CORE.MEMBER_MONTHS WHERE YEAR_MONTH BETWEEN ? AND ?",
+        params=[int(year) * 100 + 1, int(year) * 100 + 12],
+    ).iloc[0]['TOTAL']
+
+@versioned("OUTLIER_MEMBER_MONTHS")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+def get_outlier_members_count(_conn: str, year: str, data_version=None):
+    return run_query(_conn, "SELECT COUNT(DISTINCT MEMBER_ID) as total FROM OUTLIER_MEMBER_MONTHS WHERE YEAR = ?", params=[year]).iloc[0]['TOTAL']
+
+@versioned("OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+def get_encounter_count(_conn: str, year: str, data_version=None):
+    return run_query(_conn, "SELECT COUNT(DISTINCT ENCOUNTER_ID) as total FROM OUTLIER_CLAIMS_AGG WHERE INCR_YEAR = ?", params=[year]).iloc[0]['TOTAL']
+
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_pmpm_by_encounter_group(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_count AS (
+            SELECT COUNT(DISTINCT MEMBER_ID) AS TOTAL
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        )
 
-@st.cache_data
-def get_pmpm_by_encounter_group(_conn: str, year: str):
-    member_count = get_outlier_members_count(_conn, year)
-    return _conn.query(f"""
         SELECT
             ENCOUNTER_GROUP,
-            SUM(PAID_AMOUNT) / {member_count} AS PMPM
+            SUM(PAID_AMOUNT) / (SELECT TOTAL FROM member_count) AS PMPM
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         GROUP BY ENCOUNTER_GROUP
 
         UNION ALL
 
         SELECT
             'Grand Total' AS ENCOUNTER_GROUP,
-            SUM(PAID_AMOUNT) / {member_count} AS PMPM
+            SUM(PAID_AMOUNT) / (SELECT TOTAL FROM member_count) AS PMPM
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
 
         ORDER BY PMPM
-    """)
-
+    """, params=[year, year, year])
+
+
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_encounters_per_1000_by_encounter_group(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_count AS (
+            SELECT COUNT(DISTINCT MEMBER_ID) AS TOTAL
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        )
 
-@st.cache_data
-def get_encounters_per_1000_by_encounter_group(_conn: str, year: str):
-    member_count = get_outlier_members_count(_conn, year)
-    return _conn.query(f"""
         SELECT
             ENCOUNTER_GROUP,
-            (COUNT(DISTINCT ENCOUNTER_ID) * 12000.0) / {member_count} AS ENCOUNTERS_PER_1000
+            (COUNT(DISTINCT ENCOUNTER_ID) * 12000.0) / (SELECT TOTAL FROM member_count) AS ENCOUNTERS_PER_1000
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         GROUP BY ENCOUNTER_GROUP
 
         UNION ALL
 
         SELECT
             'Grand Total' AS ENCOUNTER_GROUP,
-            (COUNT(DISTINCT ENCOUNTER_ID) * 12000.0) / {member_count} AS ENCOUNTERS_PER_1000
+            (COUNT(DISTINCT ENCOUNTER_ID) * 12000.0) / (SELECT TOTAL FROM member_count) AS ENCOUNTERS_PER_1000
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
-    """)
+        WHERE INCR_YEAR = ?
+    """, params=[year, year, year])
 
 
-@st.cache_data
-def get_paid_per_encounter_by_encounter_group(_conn: str, year: str):
-    encounter_count = get_encounter_count(_conn, year)
-    return _conn.query(f"""
+@versioned("OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_paid_per_encounter_by_encounter_group(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
         SELECT
             ENCOUNTER_GROUP,
             CASE 
@@ -161,28 +317,38 @@ def get_paid_per_encounter_by_encounter_group(_conn: str, year: str):
                 ELSE SUM(PAID_AMOUNT) / COUNT(DISTINCT ENCOUNTER_ID)
             END AS PAID_PER_ENCOUNTER
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         GROUP BY ENCOUNTER_GROUP
 
         UNION ALL
 
         SELECT
             'Grand Total' AS ENCOUNTER_GROUP,
-            CASE WHEN {encounter_count} = 0 THEN 0 ELSE SUM(PAID_AMOUNT) / {encounter_count} END
+            CASE 
+                WHEN COUNT(DISTINCT ENCOUNTER_ID) = 0 THEN 0 
+                ELSE SUM(PAID_AMOUNT) / COUNT(DISTINCT ENCOUNTER_ID)
+            END
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
-    """)
+        WHERE INCR_YEAR = ?
+    """, params=[year, year])
+
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_pmpm_by_encounter_type(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_count AS (
+            SELECT COUNT(DISTINCT MEMBER_ID) AS TOTAL
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        )
 
-@st.cache_data
-def get_pmpm_by_encounter_type(_conn: str, year: str):
-    member_count = get_outlier_members_count(_conn, year)
-    return _conn.query(f"""
         SELECT
             ENCOUNTER_GROUP,
             ENCOUNTER_TYPE,
-            SUM(PAID_AMOUNT) / {member_count} AS PMPM
+            SUM(PAID_AMOUNT) / (SELECT TOTAL FROM member_count) AS PMPM
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         GROUP BY ENCOUNTER_GROUP, ENCOUNTER_TYPE
 
         UNION ALL
@@ -190,23 +356,30 @@ def get_pmpm_by_encounter_type(_conn: str, year: str):
         SELECT
             'Grand Total' AS ENCOUNTER_GROUP,
             'Grand Total' AS ENCOUNTER_TYPE,
-            SUM(PAID_AMOUNT) / {member_count} AS PMPM
+            SUM(PAID_AMOUNT) / (SELECT TOTAL FROM member_count) AS PMPM
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         ORDER BY PMPM
-    """)
-
+    """, params=[year, year, year])
+
+
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_encounters_per_1000_by_encounter_type(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_count AS (
+            SELECT COUNT(DISTINCT MEMBER_ID) AS TOTAL
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        )
 
-@st.cache_data
-def get_encounters_per_1000_by_encounter_type(_conn: str, year: str):
-    member_count = get_outlier_members_count(_conn, year)
-    return _conn.query(f"""
         SELECT
             ENCOUNTER_GROUP,
             ENCOUNTER_TYPE,
-            COUNT(DISTINCT ENCOUNTER_ID) * 12000.0 / {member_count} AS ENCOUNTERS_PER_1000
+            COUNT(DISTINCT ENCOUNTER_ID) * 12000.0 / (SELECT TOTAL FROM member_count) AS ENCOUNTERS_PER_1000
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         GROUP BY ENCOUNTER_GROUP, ENCOUNTER_TYPE
         
         UNION ALL
@@ -214,16 +387,17 @@ def get_encounters_per_1000_by_encounter_type(_conn: str, year: str):
         SELECT
             'Grand Total' AS ENCOUNTER_GROUP,
             'Grand Total' AS ENCOUNTER_TYPE,
-            COUNT(DISTINCT ENCOUNTER_ID) * 12000.0 / {member_count} AS ENCOUNTERS_PER_1000
+            COUNT(DISTINCT ENCOUNTER_ID) * 12000.0 / (SELECT TOTAL FROM member_count) AS ENCOUNTERS_PER_1000
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
-    """)
+        WHERE INCR_YEAR = ?
+    """, params=[year, year, year])
 
 
-@st.cache_data
-def get_paid_per_encounter_by_encounter_type(_conn: str, year: str):
-    encounter_count = get_encounter_count(_conn, year)
-    return _conn.query(f"""
+@versioned("OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_paid_per_encounter_by_encounter_type(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
         SELECT
             ENCOUNTER_GROUP,
             ENCOUNTER_TYPE,
@@ -232,7 +406,7 @@ def get_paid_per_encounter_by_encounter_type(_conn: str, year: str):
                 ELSE SUM(PAID_AMOUNT) / COUNT(DISTINCT ENCOUNTER_ID)
             END AS PAID_PER_ENCOUNTER
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
+        WHERE INCR_YEAR = ?
         GROUP BY ENCOUNTER_GROUP, ENCOUNTER_TYPE
 
         UNION ALL
@@ -240,21 +414,30 @@ def get_paid_per_encounter_by_encounter_type(_conn: str, year: str):
         SELECT
             'Grand Total' AS ENCOUNTER_GROUP,
             'Grand Total' AS ENCOUNTER_TYPE,
-            CASE WHEN {encounter_count} = 0 THEN 0 ELSE SUM(PAID_AMOUNT) / {encounter_count} END
+            CASE 
+                WHEN COUNT(DISTINCT ENCOUNTER_ID) = 0 THEN 0 
+                ELSE SUM(PAID_AMOUNT) / COUNT(DISTINCT ENCOUNTER_ID)
+            END
         FROM OUTLIER_CLAIMS_AGG
-        WHERE INCR_YEAR={year}
-    """)
-
-@st.cache_data
-def get_pmpm_by_diagnosis_category(_conn: str, year: str):
-    member_count = get_outlier_members_count(_conn, year)
-    return _conn.query(f"""
-        WITH category_pmpm AS (
+        WHERE INCR_YEAR = ?
+    """, params=[year, year])
+
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_pmpm_by_diagnosis_category(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_count AS (
+            SELECT COUNT(DISTINCT MEMBER_ID) AS TOTAL
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        ),
+        category_pmpm AS (
             SELECT
                 DX_CCSR_CATEGORY2,
-                SUM(PAID_AMOUNT) / {member_count} AS PMPM
+                SUM(PAID_AMOUNT) / (SELECT TOTAL FROM member_count) AS PMPM
             FROM OUTLIER_CLAIMS_AGG
-            WHERE INCR_YEAR={year}
+            WHERE INCR_YEAR = ?
             GROUP BY DX_CCSR_CATEGORY2
         ),
         total_pmpm AS (
@@ -270,18 +453,24 @@ def get_pmpm_by_diagnosis_category(_conn: str, year: str):
         FROM category_pmpm c
         CROSS JOIN total_pmpm t
         ORDER BY c.PMPM;
-    """)
-
-@st.cache_data
-def get_pmpm_by_diagnosis(_conn: str, year: str):
-    member_count = get_outlier_members_count(_conn, year)
-    return _conn.query(f"""
-        WITH category_pmpm AS (
+    """, params=[year, year])
+
+@versioned("OUTLIER_MEMBER_MONTHS", "OUTLIER_CLAIMS_AGG")
+@cache_stats.instrument(st.cache_data(max_entries=versioned_cache_entries))
+@result_cache.persist()
+def get_pmpm_by_diagnosis(_conn: str, year: str, data_version=None):
+    return run_query(_conn, """
+        WITH member_count AS (
+            SELECT COUNT(DISTINCT MEMBER_ID) AS TOTAL
+            FROM OUTLIER_MEMBER_MONTHS
+            WHERE YEAR = ?
+        ),
+        category_pmpm AS (
             SELECT
                 DX_DESCRIPTION,
-                SUM(PAID_AMOUNT) / {member_count} AS PMPM
+                SUM(PAID_AMOUNT) / (SELECT TOTAL FROM member_count) AS PMPM
             FROM OUTLIER_CLAIMS_AGG
-            WHERE INCR_YEAR={year}
+            WHERE INCR_YEAR = ?
             GROUP BY DX_DESCRIPTION
         ),
         total_pmpm AS (
@@ -297,4 +486,42 @@ def get_pmpm_by_diagnosis(_conn: str, year: str):
         FROM category_pmpm c
         CROSS JOIN total_pmpm t
         ORDER BY c.PMPM;
-    """)
\ No newline at end of file
+    """, params=[year, year])
+
+# PAGE QUERIES
+
+# None of the queries behind a page depend on each other, so they are submitted together from a thread pool
+# and the page waits only as long as the slowest one. Each worker calls the cached function itself, so the
+# st.cache_data entries are filled the same way as when the page calls them one after another.
+
+encounter_page_queries = {
+    "pmpm_by_group": get_pmpm_by_encounter_group,
+    "encounters_per_1000_by_group": get_encounters_per_1000_by_encounter_group,
+    "paid_per_encounter_by_group": get_paid_per_encounter_by_encounter_group,
+    "pmpm_by_type": get_pmpm_by_encounter_type,
+    "encounters_per_1000_by_type": get_encounters_per_1000_by_encounter_type,
+    "paid_per_encounter_by_type": get_paid_per_encounter_by_encounter_type,
+}
+
+diagnosis_page_queries = {
+    "pmpm_by_diagnosis_category": get_pmpm_by_diagnosis_category,
+    "pmpm_by_diagnosis": get_pmpm_by_diagnosis,
+}
+
+def run_queries(_conn: str, year: str, queries: dict):
+    ctx = get_script_run_ctx()
+
+    def run(func):
+        # Workers need the script run context to reach the session's caches and spinners.
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(_conn, year)
+
+    with ThreadPoolExecutor(max_workers=len(queries), thread_name_prefix="snowflake-query") as pool:
+        futures = {name: pool.submit(run, func) for name, func in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+def get_encounter_page_data(_conn: str, year: str):
+    return run_queries(_conn, year, encounter_page_queries)
+
+def get_diagnosis_page_data(_conn: str, year: str):
+    return run_queries(_conn, year, diagnosis_page_queries)
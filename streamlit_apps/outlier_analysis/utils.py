@@ -1,8 +1,16 @@
+import os
 from decimal import ROUND_HALF_UP, Decimal
 
 import pandas as pd
 
 
+def env_flag(name, default=False):
+    """Read an on/off switch from the environment, accepting 1/true/yes/on."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 def safe_extract(series, default=0, as_type=float):
     """Safely extract first item from a Series and convert to given type."""
     if isinstance(series, pd.Series) and not series.empty and pd.notna(series.iloc[0]):
@@ -8,8 +8,10 @@ st.logo("assets/tuva_logo.png", size="large")
 # Importing pages for navigation
 dashboard_page = st.Page("pages/dashboard.py", title="Dashboard")
 claim_amount_page = st.Page("pages/claim_amount.py", title="Claim Amount")
+# Cache and query statistics for maintainers, left out of the navigation menu.
+diagnostics_page = st.Page("pages/diagnostics.py", title="Diagnostics", url_path="diagnostics", visibility="hidden")
 
 # Setup navigation
-app = st.navigation([dashboard_page, claim_amount_page])
+app = st.navigation([dashboard_page, claim_amount_page, diagnostics_page])
 
 app.run()
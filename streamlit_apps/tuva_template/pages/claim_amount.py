@@ -4,12 +4,16 @@ import plotly.graph_objects as go
 import streamlit as st
 
 from shared import path_utils
-from shared.utils import helpers
+from shared.utils import helpers, query_log
 
 path_utils.add_repo_to_path(levels_up=3)
 
 
-conn = st.connection("snowflake")
+# Queries are tagged and logged per page, see the hidden diagnostics page.
+conn = query_log.get_traced_connection("snowflake")
+
+# Sidebar filters, including the paid amount range, are applied in the aggregate queries.
+filters = helpers.render_claim_filters(conn)
 
 """
 # Claim Amount Analysis
@@ -21,9 +25,6 @@ This page allows you to analyze the amount spent for each claim line number. You
 3. The table will display the filtered data with the selected category and amount paid.
 """
 
-data = helpers.get_table_data(conn)
-
-
 # Dropdown to select where the expense was made.
 spent_category_options = {
     "Encounter Group": "ENCOUNTER_GROUP",
@@ -41,10 +42,7 @@ with col1:
     )
 selected_category = spent_category_options[selected_category_label]
 
-# Paid amount range slider.
-max_range = data["PAID_AMOUNT"].max()
-
-agg_data = data.groupby(selected_category, as_index=False)["PAID_AMOUNT"].sum()
+agg_data = helpers.get_paid_by_category(conn, selected_category, filters=filters)
 rose_fig = px.bar_polar(
     agg_data,
     r="PAID_AMOUNT",
@@ -57,11 +55,10 @@ rose_fig = px.bar_polar(
 rose_fig
 
 # Display the histogram.
-fig = px.histogram(
-    data,
+fig = px.bar(
+    agg_data,
     x=selected_category,
     y="PAID_AMOUNT",
-    histfunc="sum",
     title=f"Distribution of Amount spent for each Claim Line by {selected_category_label}",
     labels={"PAID_AMOUNT": "Amount Paid"},
 )
@@ -73,14 +70,9 @@ fig
 ## Expense Detail
 """
 
-data["CLAIM_START_DATE"] = pd.to_datetime(data["CLAIM_START_DATE"].astype(str), errors="coerce").dt.strftime("%Y-%m")
-
 # Sum total paid and total allowed amounts by month
-monthly_agg = (
-    data.groupby("CLAIM_START_DATE")[["PAID_AMOUNT", "ALLOWED_AMOUNT"]]
-    .sum()
-    .reset_index()
-)
+monthly_agg = helpers.get_monthly_paid_and_allowed(conn, filters=filters)
+monthly_agg["CLAIM_START_DATE"] = pd.to_datetime(monthly_agg["CLAIM_MONTH"]).dt.strftime("%Y-%m")
 
 
 #  using plotly line chart.
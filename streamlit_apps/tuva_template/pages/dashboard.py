@@ -3,14 +3,11 @@ import plotly.express as px
 import streamlit as st
 
 from shared import path_utils
-from shared.utils import helpers
+from shared.utils import helpers, query_log
 
 path_utils.add_repo_to_path(levels_up=3)
 
 
-# Use helper function
-data = helpers.get_table_data(st.connection("snowflake"))
-
 # Custom Styling
 st.markdown(
     """
@@ -27,9 +24,12 @@ st.markdown(
 
 
 # Display table data
-conn = st.connection("snowflake")
+# Queries are tagged and logged per page, see the hidden diagnostics page.
+conn = query_log.get_traced_connection("snowflake")
 
-data = helpers.get_table_data(conn)
+# Sidebar filters are applied in the query, so only matching claims are fetched.
+filters = helpers.render_claim_filters(conn)
+data = helpers.get_table_data(conn, filters=filters)
 
 df = pd.DataFrame(data)
 
@@ -71,10 +71,12 @@ st.session_state.selected_label = dropdown_options[selected_label]
 color = 'ENCOUNTER_TYPE' if x_axis == 'ENCOUNTER_GROUP' else x_axis
 
 # Pie chart data initialization.
-df_count = data[x_axis].value_counts().reset_index()
-df_count.columns = [x_axis, "count"]
-highest = df_count["count"].max()
-highest_name = df_count.loc[df_count["count"] == highest, x_axis].values[0]
+df_count = helpers.get_claim_counts(conn, [x_axis], filters=filters)
+if df_count.empty:
+    st.info("No claims match the selected filters.")
+    st.stop()
+highest = df_count["CLAIM_COUNT"].max()
+highest_name = df_count.loc[df_count["CLAIM_COUNT"] == highest, x_axis].values[0]
 
 a, b = st.columns(2)
 a.metric(f"Highest {x_axis}", highest_name, border=True)
@@ -85,12 +87,13 @@ tab1, tab2 = st.tabs(["📊 Bar Chart", "📈 Pie Chart"])
 
 #  Bar Chart
 tab1.subheader("📊 Bar Chart")
-fig = px.histogram(
-    data,
+bar_group_by = [x_axis] if color == x_axis else [x_axis, color]
+bar_data = helpers.get_claim_counts(conn, bar_group_by, count_column=y_axis, filters=filters)
+fig = px.bar(
+    bar_data,
     x=x_axis,
-    y=y_axis,
-    histfunc="count",
-    labels={x_axis: x_axis, y_axis: f"Total {y_axis}"},
+    y="CLAIM_COUNT",
+    labels={x_axis: x_axis, "CLAIM_COUNT": f"Total {y_axis}"},
     title=f"Bar Chart of {y_axis} by {x_axis}",
     color=color,
 )
@@ -102,7 +105,7 @@ tab2.subheader("📈 Pie Chart")
 fig_pie = px.pie(
     df_count,
     names=x_axis,
-    values="count",
+    values="CLAIM_COUNT",
     title=f"Pie Chart of {y_axis} by {x_axis}",
     color=x_axis,
     color_discrete_sequence=px.colors.qualitative.Set2,
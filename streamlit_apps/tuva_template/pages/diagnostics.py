@@ -0,0 +1,9 @@
+from shared import path_utils
+from shared.utils import query_log
+from shared.utils.diagnostics import render_diagnostics
+
+path_utils.add_repo_to_path(levels_up=3)
+
+
+# Hidden from the navigation; open it at /diagnostics.
+render_diagnostics(query_log.get_traced_connection("snowflake"))